@@ -1,24 +1,110 @@
+from bisect import bisect_right
+import calendar
 from datetime import datetime, timedelta, tzinfo
-import locale
+import locale as _locale
 import sys
+import threading
 import time
 
-import pytz
-from pytz.exceptions import UnknownTimeZoneError
+from .backends import BACKENDS, convert, get_backend, localize
+from .cache import LRUCache, ResultCache
+from .clocks import CoarseClock, FrozenClock, SystemClock
+from .compiler import UNIX_FORMATS, compile_format, format_resolution
+from .epochs import EpochFormatter
+from .live import LiveParse
+from .locales import LocaleTable, UnknownLocaleError, load_locale, setlocale_lock
+from .pool import map_chunks
+from .reformat import Reformatter
+from . import series as _series
+from .templates import Template, compile_template, is_template
+from .timing import Instrumentation, StageTimer, clock, load_times
+from .tzindex import TimezoneIndex
 
 
 # Not using sublime.version here because it's supposed to be used externally too
 ST2 = sys.version_info[0] == 2
 
+# pytz is only imported when a timezone name needs to be resolved, see `load_pytz`
+pytz = None
+_locale_ready = False
+_tz_index = None
 
-# This loads the actual systems time local_tze, (None, None) otherwise.
-# Required for use with datetime.strftime("%c %x %X").
-locale.setlocale(locale.LC_TIME, '')
+
+class UnknownTimeZoneError(KeyError):
+    """Raised for timezone names that are unknown to the timezone backend.
+
+    Defined here instead of re-exporting pytz's exception so that pytz does not need to be imported
+    with this module.
+    """
+
+
+def load_pytz():
+    """Imports pytz on first use and returns the module."""
+    global pytz
+    if pytz is None:
+        start = clock()
+        import pytz as module
+        pytz = module
+        load_times.append(("import pytz", clock() - start))
+    return pytz
+
+
+def setup_locale():
+    """Loads the system's locale for LC_TIME on first use.
+
+    Required for use with datetime.strftime("%c %x %X").
+    """
+    global _locale_ready
+    if not _locale_ready:
+        start = clock()
+        with setlocale_lock:
+            # This loads the actual systems time local_tze, (None, None) otherwise.
+            _locale.setlocale(_locale.LC_TIME, '')
+        _locale_ready = True
+        load_times.append(("setlocale", clock() - start))
+
+
+def all_timezones():
+    """Returns pytz's list of all timezone names."""
+    return load_pytz().all_timezones
+
+
+def zone_name(tz):
+    """Returns a readable name for a tzinfo object (or `None`)."""
+    if tz is None:
+        return "-"
+    # pytz and zoneinfo respectively
+    return getattr(tz, 'zone', None) or getattr(tz, 'key', None) or type(tz).__name__
+
+
+def timezone_index():
+    """Returns a TimezoneIndex over all timezones, built on first use.
+
+    The index is rebuilt only when the tz database version (or the current year) changes.
+    """
+    global _tz_index
+    pytz = load_pytz()
+    year = datetime.now().year
+    if (_tz_index is None
+            or _tz_index.version != pytz.OLSON_VERSION
+            or _tz_index.year != year):
+        _tz_index = TimezoneIndex(pytz, year)
+    return _tz_index
 
 
 if not ST2:
     basestring = str
 
+# datetime(1970, 1, 1).toordinal()
+EPOCH_ORDINAL = 719163
+
+# Marks cache misses, since `None` is cached for unknown timezone names
+_MISSING = object()
+
+# Results spanning more than this many nanoseconds are re-rendered at multiples of it in UTC,
+# which covers the times at which UTC offsets change
+_OFFSET_CHANGE_INTERVAL = 900 * 10 ** 9
+
 
 class LocalTimezone(tzinfo):
     """Helper class which extends datetime.tzinfo and implements the 'local timezone'.
@@ -52,7 +138,30 @@ class LocalTimezone(tzinfo):
         # This is too much of a hassle and will never be as clean as using pytz anyway.
         return None
 
+    # Years for which transition tables are built; `time.localtime` is unreliable outside of it
+    TABLE_YEARS = (1970, 2037)
+    # Wall times this close (in seconds) to a transition are resolved by libc
+    AMBIGUITY = 3 * 3600
+
+    # year -> (transitions, flags) or None if the year has to be resolved by libc
+    _tables = {}
+
     def _isdst(self, dt):
+        table = self._year_table(dt.year)
+        if table is None:
+            return self._libc_isdst(dt)
+
+        transitions, flags = table
+        # Interpret the wall time as standard time, like `mktime` does with `tm_isdst = 0`
+        stamp = ((dt.toordinal() - EPOCH_ORDINAL) * 86400
+                 + dt.hour * 3600 + dt.minute * 60 + dt.second + time.timezone)
+        i = bisect_right(transitions, stamp)
+        if ((i > 0 and stamp - transitions[i - 1] < self.AMBIGUITY)
+                or (i < len(transitions) and transitions[i] - stamp < self.AMBIGUITY)):
+            return self._libc_isdst(dt)
+        return flags[i]
+
+    def _libc_isdst(self, dt):
         tt = (dt.year, dt.month, dt.day,
               dt.hour, dt.minute, dt.second,
               dt.weekday(), 0, 0)
@@ -60,24 +169,138 @@ class LocalTimezone(tzinfo):
         tt = time.localtime(stamp)
         return tt.tm_isdst > 0
 
+    @classmethod
+    def _year_table(cls, year):
+        try:
+            return cls._tables[year]
+        except KeyError:
+            pass
+
+        table = None
+        if cls.TABLE_YEARS[0] <= year <= cls.TABLE_YEARS[1]:
+            table = cls._build_year_table(year)
+        cls._tables[year] = table
+        return table
+
+    @classmethod
+    def _build_year_table(cls, year):
+        """Collects the UTC timestamps of all DST transitions around `year`.
+
+        Returns `(transitions, flags)` where `flags[i]` is the DST state before `transitions[i]`
+        (and `flags[-1]` the state after the last one), or `None` if the year uses UTC offsets
+        that differ from `STDOFFSET` and `DSTOFFSET`.
+        """
+        offsets = (-time.timezone, -time.altzone if time.daylight else -time.timezone)
+
+        def isdst(stamp):
+            tt = time.localtime(stamp)
+            flag = tt.tm_isdst > 0
+            gmtoff = getattr(tt, 'tm_gmtoff', None)
+            if gmtoff is not None and gmtoff != offsets[flag]:
+                raise ValueError(gmtoff)
+            return flag
+
+        # Cover a day more than the year on each side for wall times near the year boundary
+        start = calendar.timegm((year, 1, 1, 0, 0, 0)) - 86400
+        end = calendar.timegm((year + 1, 1, 1, 0, 0, 0)) + 86400
+
+        transitions = []
+        try:
+            flags = [isdst(start)]
+            prev = start
+            while prev < end:
+                stamp = min(prev + 86400, end)
+                flag = isdst(stamp)
+                if flag != flags[-1]:
+                    # Find the exact second the state changed in
+                    lo, hi = prev, stamp
+                    while hi - lo > 1:
+                        mid = (lo + hi) // 2
+                        if isdst(mid) == flag:
+                            hi = mid
+                        else:
+                            lo = mid
+                    transitions.append(hi)
+                    flags.append(flag)
+                prev = stamp
+        except (ValueError, OverflowError, OSError):
+            return None
+
+        return transitions, flags
+
+
+def _result_interval(now_ns, dt, resolution):
+    """Returns the interval in nanoseconds around `now_ns` that a result of `resolution` is valid.
+
+    `dt` is the rendered local time and only needed for resolutions above a second.
+    """
+    elapsed = now_ns % 10 ** 9
+    if resolution >= 60:
+        elapsed += dt.second * 10 ** 9
+    if resolution >= 3600:
+        elapsed += dt.minute * 60 * 10 ** 9
+    if resolution >= 86400:
+        elapsed += dt.hour * 3600 * 10 ** 9
+    start = now_ns - elapsed
+    end = start + resolution * 10 ** 9
+    if end - start > _OFFSET_CHANGE_INTERVAL:
+        # The UTC offset, and thus the wall time, may change within the interval
+        boundary = now_ns - now_ns % _OFFSET_CHANGE_INTERVAL
+        start = max(start, boundary)
+        end = min(end, boundary + _OFFSET_CHANGE_INTERVAL)
+    return start, end
+
+
+class FrozenDict(dict):
+    """A dict that can not be changed after construction."""
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("%s does not support item assignment" % type(self).__name__)
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _immutable
+
 
 class FormatDate(object):
     """The actual processing class where conversation and formatting of datetime (between timezones)
     takes place.
 
     You can pass your own default values to the constructor which will be used as default values if
-    a parameter is missing during the process.
+    a parameter is missing during the process. `clock` is the source of the current time, like
+    a FrozenClock for reproducible output (see the `clocks` module). `backend` names the library
+    that resolves timezone names (see `set_backend`).
+
+    `default` is an immutable snapshot that `set_default` replaces as a whole, so instances can be
+    used from several threads while their defaults change; every call uses either the old or the
+    new defaults.
 
     `FormatDate().parse(format=None, tz_in=None, tz_out=None)` is most likely what you'll be using.
     """
 
     local_tz = LocalTimezone()
-    default = dict(
+    default = FrozenDict(
         format="%c",
-        tz_in="local"
+        tz_in="local",
+        locale=None
     )
+    # Maximum number of timezone names (including unknown ones) remembered per instance
+    tz_cache_size = 1024
+    # An Instrumentation object to record the duration of each stage of `parse` in, if any
+    instrumentation = None
+    clock = SystemClock()
+    backend_name = 'pytz'
+    # A ResultCache for `parse`, see `enable_result_cache`
+    result_cache = None
+
+    def __init__(self, local_tz=None, default=None, clock=None, backend=None):
+        self._tz_cache = LRUCache(self.tz_cache_size)
+        self._backend = None
+        # Serializes updates of the defaults and the backend
+        self._lock = threading.Lock()
+        if clock is not None:
+            self.clock = clock
+        if backend is not None:
+            self.set_backend(backend)
 
-    def __init__(self, local_tz=None, default=None):
         if local_tz:
             if isinstance(local_tz, tzinfo):
                 self.local_tz = local_tz
@@ -88,37 +311,349 @@ class FormatDate(object):
             self.set_default(default)
 
     def set_default(self, update):
-        # Update only the keys that are defined in self.default
-        for k, v in update.items():
-            if k in self.default:
-                self.default[k] = v
+        """Replaces the defaults with a copy that has the keys of `update` changed.
 
-    def parse(self, format=None, tz_in=None, tz_out=None):
-        # 'unix'
-        if format == "unix":
-            return str(time.time()).split('.')[0]
+        Only keys that are defined in `default` are used.
+        """
+        with self._lock:
+            old = self.default
+            default = dict(old)
+            for k, v in update.items():
+                if k in default:
+                    default[k] = v
+            if default['tz_in'] != old['tz_in']:
+                self.clear_tz_cache()
+            self.default = FrozenDict(default)
+
+    @property
+    def backend(self):
+        """The timezone backend, loaded on first use."""
+        if self._backend is None:
+            self._backend = get_backend(self.backend_name)
+        return self._backend
+
+    def set_backend(self, name):
+        """Selects the timezone backend: 'pytz', 'zoneinfo' (Python 3.9+), 'table' or 'auto'.
+
+        Raises ValueError for unknown names and for backends that are not available here, like
+        'zoneinfo' before Python 3.9. pytz is only loaded on first use.
+        """
+        if name != 'auto' and name not in BACKENDS:
+            raise ValueError("Unknown timezone backend %r; expected one of %s"
+                             % (name, ", ".join(sorted(BACKENDS) + ['auto'])))
+        # pytz is always available, so only load the others now to report problems right away
+        backend = get_backend(name) if name != 'pytz' else None
+        with self._lock:
+            if name != self.backend_name:
+                self.backend_name = name
+                self._backend = backend
+                self.clear_tz_cache()
+                if self.result_cache is not None:
+                    self.result_cache.clear()
+
+    def enable_result_cache(self, maxsize=256):
+        """Makes `parse` remember its results until the output of their format changes.
+
+        Results are kept per format, timezones and locale for the interval of the format's finest
+        field, e.g. until the next minute for "%H:%M". Formats with `%f` are always rendered.
+        `result_cache.hit_rate` tells how often a stored result was used.
+        """
+        self.result_cache = ResultCache(maxsize)
+        return self.result_cache
+
+    def disable_result_cache(self):
+        self.result_cache = None
+
+    @property
+    def tz_cache_hits(self):
+        return self._tz_cache.hits
+
+    @property
+    def tz_cache_misses(self):
+        return self._tz_cache.misses
+
+    def clear_tz_cache(self):
+        """Forgets all resolved (and unknown) timezone names and resets the counters."""
+        self._tz_cache.clear()
+
+    def resolve_tz(self, tz):
+        """Returns the timezone for the name `tz` or `None` if it is unknown.
+
+        Results are cached per instance, unknown names included.
+        """
+        resolved = self._tz_cache.get(tz, _MISSING)
+        if resolved is _MISSING:
+            resolved = self.backend.timezone(tz)
+            self._tz_cache.put(tz, resolved)
+        return resolved
+
+    def _lap(self, stage, key, start):
+        # Records the time since `start` and returns the current time
+        now = clock()
+        self.instrumentation.record(stage, key, now - start)
+        return now
+
+    def parse(self, format=None, tz_in=None, tz_out=None, locale=None):
+        # Use the same defaults throughout, even if they are replaced meanwhile
+        default = self.default
+        if format is None:
+            format = default['format']
+        if tz_in is None:
+            tz_in = default['tz_in']
+        if locale is None:
+            locale = default['locale']
+
+        if self.result_cache is not None:
+            return self._parse_cached(format, tz_in, tz_out, locale, default)
+
+        # 'unix', 'unix_ms', 'unix_us', 'unix_ns'
+        if format in UNIX_FORMATS:
+            if self.instrumentation is None:
+                return str(self.clock.time_ns() * UNIX_FORMATS[format] // 10 ** 9)
+            start = clock()
+            text = str(self.clock.time_ns() * UNIX_FORMATS[format] // 10 ** 9)
+            self._lap('format', format, start)
+            return text
+
+        # templates with several fields, like "${%H:%M} (${%H:%M|tz_out=UTC})"
+        if is_template(format):
+            return self.parse_template(format, tz_in, tz_out, locale)
 
         # anything else
         dt = self.date_gen(tz_in, tz_out)
-        text = self.date_format(dt, format)
+        return self.parse_datetime(dt, format, locale)
+
+    def _parse_cached(self, format, tz_in, tz_out, locale, default):
+        now_ns = self.clock.time_ns()
+        key = (format, tz_in, tz_out, locale)
+        text = self.result_cache.get(key, now_ns)
+        if text is not None:
+            return text
+
+        dt = None
+        if format in UNIX_FORMATS:
+            text = str(now_ns * UNIX_FORMATS[format] // 10 ** 9)
+            resolution = 1 if format == 'unix' else 0
+        elif is_template(format):
+            template = compile_template(format)
+            text = self._render_template(template, tz_in, tz_out, locale, now_ns, {}, default)
+            resolution = template.resolution(default['format'], locale)
+        else:
+            dt = self.date_gen(tz_in, tz_out, now_ns / 1e9)
+            text = self.parse_datetime(dt, format, locale)
+            resolution = format_resolution(format, locale)
+
+        if resolution is None:
+            # Nothing time-dependent
+            self.result_cache.put(key, text, float('-inf'), float('inf'))
+        elif resolution:
+            start, end = _result_interval(now_ns, dt, resolution)
+            self.result_cache.put(key, text, start, end)
+        return text
+
+    def parse_template(self, template=None, tz_in=None, tz_out=None, locale=None, now=None):
+        """Renders a template with several `${format|tz_out=...}` fields (see `templates`).
+
+        All fields use the same point in time, `now` seconds since the epoch or the clock's current
+        time, and each distinct (tz_in, tz_out) pair is only converted once. `tz_in`, `tz_out` and
+        `locale` apply to fields that do not set them.
+        """
+        default = self.default
+        if template is None:
+            template = default['format']
+        now_ns = self.clock.time_ns() if now is None else int(round(now * 1e9))
+        return self._render_template(compile_template(template), tz_in, tz_out, locale,
+                                     now_ns, {}, default)
+
+    def _render_template(self, template, tz_in, tz_out, locale, now_ns, converted, default):
+        # `converted` maps (tz_in, tz_out) pairs to datetimes and may be shared between calls
+        now = now_ns / 1e9
+        if tz_in is None:
+            tz_in = default['tz_in']
+        if locale is None:
+            locale = default['locale']
+        values = []
+        for format, params in template.fields:
+            if format is None:
+                format = default['format']
+                if is_template(format):
+                    raise ValueError("Template fields without format require a default format "
+                                     "that is not a template")
+            if format in UNIX_FORMATS:
+                values.append(str(now_ns * UNIX_FORMATS[format] // 10 ** 9))
+                continue
+            key = (params.get('tz_in', tz_in), params.get('tz_out', tz_out))
+            dt = converted.get(key)
+            if dt is None:
+                dt = converted[key] = self.date_gen(key[0], key[1], now)
+            values.append(self.parse_datetime(dt, format, params.get('locale', locale)))
+        return template.join(values)
+
+    def parse_datetime(self, dt, format=None, locale=None):
+        """Like `parse`, but formats the given datetime object instead of the current time."""
+        text = self.date_format(dt, format, locale)
 
         # Fix potential unicode/codepage issues
         if ST2 and isinstance(text, str):
+            if self.instrumentation is not None:
+                start = clock()
             try:
-                text = text.decode(locale.getpreferredencoding())
+                text = text.decode(_locale.getpreferredencoding())
             except UnicodeDecodeError:
                 text = text.decode('utf-8')
+            if self.instrumentation is not None:
+                self._lap('decode', format or self.default['format'], start)
 
         return text
 
+    def parse_many(self, configs, workers=None):
+        """Parses a sequence of dicts with the parameters of `parse` at once.
+
+        All items use the same point in time and each (tz_in, tz_out) pair is only converted once,
+        including those of template fields. Returns a list of `(text, exception)` tuples in the
+        order of `configs`, where `exception` is `None` on success and `text` is `None` on failure.
+
+        With `workers`, long sequences are split into chunks that are rendered by a thread pool
+        (see the `pool` module).
+        """
+        now_ns = self.clock.time_ns()
+        default = self.default
+        if not workers or workers < 2:
+            return self._parse_chunk(configs, now_ns, default)
+
+        def parse_chunk(chunk):
+            return self._parse_chunk(chunk, now_ns, default)
+
+        results = []
+        for chunk_results in map_chunks(parse_chunk, list(configs), workers):
+            results.extend(chunk_results)
+        return results
+
+    def _parse_chunk(self, configs, now_ns, default):
+        # Nothing but the local variables is changed, so chunks can be parsed concurrently
+        now = now_ns / 1e9
+        converted = {}
+        results = []
+        for config in configs:
+            format = config.get('format')
+            if format is None:
+                format = default['format']
+            locale = config.get('locale')
+            if locale is None:
+                locale = default['locale']
+            try:
+                if format in UNIX_FORMATS:
+                    text = str(now_ns * UNIX_FORMATS[format] // 10 ** 9)
+                elif is_template(format):
+                    text = self._render_template(compile_template(format),
+                                                 config.get('tz_in'), config.get('tz_out'),
+                                                 locale, now_ns, converted, default)
+                else:
+                    key = (config.get('tz_in') or default['tz_in'], config.get('tz_out'))
+                    dt = converted.get(key)
+                    if dt is None:
+                        dt = converted[key] = self.date_gen(key[0], key[1], now)
+                    text = self.parse_datetime(dt, format, locale)
+            except Exception as e:
+                results.append((None, e))
+            else:
+                results.append((text, None))
+        return results
+
+    def format_epochs(self, values, format=None, tz_out=None, locale=None, lazy=False,
+                      workers=None):
+        """Formats a sequence of unix timestamps with `format` in the timezone `tz_out`.
+
+        `values` can be any iterable of numbers, including `array.array`, memoryview and NumPy
+        arrays. `tz_out` defaults to the default `tz_in`. Consecutive values on the same day and
+        with the same UTC offset share the rendered date and offset parts, so sorted series are
+        formatted considerably faster than with `parse_datetime`.
+
+        With `workers`, `values` is split into chunks that are formatted by a thread pool, each with
+        its own formatter. `lazy` is ignored then.
+
+        Returns a list of strings, or a generator if `lazy` is true.
+        """
+        default = self.default
+        if format is None:
+            format = default['format']
+        if tz_out is None:
+            tz_out = default['tz_in']
+        if tz_out == "local":
+            tz_out = self.local_tz
+        tz_out = self.check_tzparam(tz_out, 'tz_out')
+        if locale is None:
+            locale = default['locale']
+
+        setup_locale()
+        if workers and workers > 1:
+            if not hasattr(values, '__getitem__'):
+                values = list(values)
+
+            def format_chunk(chunk):
+                return list(EpochFormatter(format, tz_out, locale).iterate(chunk))
+
+            texts = []
+            for chunk_texts in map_chunks(format_chunk, values, workers):
+                texts.extend(chunk_texts)
+            return texts
+
+        texts = EpochFormatter(format, tz_out, locale).iterate(values)
+        if lazy:
+            return texts
+        return list(texts)
+
+    def series(self, count, step="+1d", start=None, format=None, tz_in=None, tz_out=None,
+               locale=None):
+        """Renders `count` dates that are `step` apart, like "+1d", "15m" or "-1w".
+
+        The dates are rendered in `tz_out` (or `tz_in` if it is `None`). `start` is a unix
+        timestamp, an ISO date like "2024-01-05" or "2024-01-05 13:00" in that timezone, or
+        `None` for the current time as `parse` would render it. See the `series` module for how
+        steps of days and weeks differ from shorter ones.
+
+        Returns a list of strings.
+        """
+        seconds, wall = _series.parse_step(step)
+        default = self.default
+        if format is None:
+            format = default['format']
+        if tz_in is None:
+            tz_in = default['tz_in']
+        if locale is None:
+            locale = default['locale']
+        if is_template(format):
+            raise ValueError("Templates can not be used for series")
+
+        if tz_out is not None:
+            tz = self.check_tzparam(self.local_tz if tz_out == "local" else tz_out, 'tz_out')
+        else:
+            tz = self.check_tzparam(self.local_tz if tz_in == "local" else tz_in, 'tz_in')
+
+        if start is None:
+            first = self.date_gen(tz_in, tz_out)
+        elif isinstance(start, basestring):
+            first = _series.localize_wall(_series.parse_start(start), tz)
+        else:
+            first = datetime.fromtimestamp(start, tz)
+
+        if wall:
+            dts = _series.wall_datetimes(first.replace(tzinfo=None), seconds, count, tz)
+            return [self.parse_datetime(dt, format, locale) for dt in dts]
+
+        # Shorter steps share most of the work between items, see `format_epochs`
+        setup_locale()
+        stamps = _series.epochs(_series.timestamp(first), seconds, count)
+        return list(EpochFormatter(format, tz, locale).iterate(stamps))
+
     def check_tzparam(self, tz, name):
         if isinstance(tz, basestring):
-            try:
-                tz = str(tz)  # convert to ansi for ST2
-                return pytz.timezone(tz)
-            except UnknownTimeZoneError:
+            tz = str(tz)  # convert to ansi for ST2
+            resolved = self.resolve_tz(tz)
+            if resolved is None:
                 raise UnknownTimeZoneError("Parameter %r = %r is not a valid timezone name"
                                            % (name, tz))
+            return resolved
 
         if tz is not None and not isinstance(tz, tzinfo):
             raise TypeError("Parameter %r = %r is not an instance of datetime.tzinfo"
@@ -127,8 +662,16 @@ class FormatDate(object):
         # Nothing else to be done
         return tz
 
-    def date_gen(self, tz_in=None, tz_out=None):
-        """Generates the according datetime object using given parameters"""
+    def date_gen(self, tz_in=None, tz_out=None, now=None):
+        """Generates the according datetime object using given parameters
+
+        `now` is a timestamp as returned by `time.time()` and defaults to the current time of the
+        instance's clock.
+        """
+        instrumented = self.instrumentation is not None
+        if instrumented:
+            start = clock()
+
         # Check parameters and gather tzinfo data (and raise a few exceptions)
         if tz_in is None:
             tz_in = self.default['tz_in']
@@ -138,13 +681,18 @@ class FormatDate(object):
 
         tz_in  = self.check_tzparam(tz_in,  'tz_in')
         tz_out = self.check_tzparam(tz_out, 'tz_out')
+        if instrumented:
+            start = self._lap('resolve', "%s, %s" % (zone_name(tz_in), zone_name(tz_out)), start)
 
         # Get timedata
-        try:
-            dt = tz_in.localize(datetime.now())
-        except AttributeError:
-            # Fallback for non-pytz timezones ('local')
-            dt = datetime.now(tz=tz_in)
+        if now is None:
+            now = self.clock.time()
+        dt = localize(datetime.fromtimestamp(now), tz_in)
+        if dt is None:
+            # Fallback for other timezones ('local')
+            dt = datetime.fromtimestamp(now, tz=tz_in)
+        if instrumented:
+            start = self._lap('localize', zone_name(tz_in), start)
 
         # Process timedata
         # TODO: shift datetime here | split into other function(s)
@@ -152,30 +700,32 @@ class FormatDate(object):
             return dt
 
         # Adjust timedata for target timezone
-        dt = dt.astimezone(tz_out)
-        try:
-            return tz_out.normalize(dt)
-        except AttributeError:
-            # Fallback for non-pytz timezones ('local')
-            return dt
+        dt = convert(dt, tz_out)
+        if instrumented:
+            self._lap('convert', zone_name(tz_out), start)
+        return dt
 
-    def date_format(self, dt, format=None):
+    def date_format(self, dt, format=None, locale=None):
         """Formats the given datetime object using `format` string.
 
         Differs from normal datetime.strftime function because I implemented
         some additional values (like 'iso') and a fallback for `format=None`
         is used.
+
+        `locale` names the locale for `%c`, `%a`, `%p` etc. (like "de_DE.UTF-8"); the process'
+        locale is used if neither it nor the default locale is set.
         """
+        default = self.default
         if format is None:
-            format = self.default['format']
-
-        # 'iso', 'iso:T'
-        if format.startswith("iso"):
-            sep = 'T'
-            if len(format) == 5 and format[3] == ':':
-                sep = str(format[-1])  # convert from unicode (ST2)
-            # Set microseconds to 0 because they are practically useless and only add noise
-            dt = dt.replace(microsecond=0)
-            return dt.isoformat(sep)
-
-        return dt.strftime(format)
+            format = default['format']
+        if locale is None:
+            locale = default['locale']
+
+        setup_locale()
+        if self.instrumentation is None:
+            return compile_format(format, locale)(dt)
+
+        start = clock()
+        text = compile_format(format, locale)(dt)
+        self._lap('format', format, start)
+        return text
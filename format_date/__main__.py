@@ -0,0 +1,232 @@
+"""Re-renders timestamps in text streams, e.g. log files.
+
+Usage: python -m format_date [options] [FILE ...]
+
+Reads the given files (or stdin) in blocks and writes them to stdout with every ISO or unix
+timestamp converted like `FormatDate.parse` would render it. Memory usage does not depend on the
+size of the input. With `--workers`, large files are split at line boundaries and processed by a
+pool of processes, while the output keeps the original order. Matches that are not valid dates,
+like "2024-02-30 10:00", are passed through unchanged and counted on stderr.
+"""
+
+import argparse
+import codecs
+import errno
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+from . import FormatDate, Reformatter
+from .reformat import INPUT_PATTERNS, MAX_MATCH, _split_chunk
+
+
+BUFFER_SIZE = 1 << 16
+# Files smaller than this are not split across workers
+MIN_SPLIT_SIZE = 1 << 23
+
+ENCODING = 'utf-8'
+# Pass invalid bytes through unchanged
+ERRORS = 'surrogateescape'
+
+# Per-process Reformatter, see `_get_reformatter`
+_reformatter = None
+
+
+def _make_reformatter(options):
+    fdate = FormatDate()
+    return Reformatter(fdate, options['format'], options['tz_in'], options['tz_out'],
+                       options['inputs'])
+
+
+def _get_reformatter(options):
+    global _reformatter
+    if _reformatter is None:
+        _reformatter = _make_reformatter(options)
+    return _reformatter
+
+
+def _reformat_blocks(reformatter, blocks, write):
+    """Writes the text of the iterable `blocks` with `write`, re-rendering timestamps.
+
+    The end of each block that may belong to a timestamp (see `reformat._split_chunk`) is carried
+    over to the next one, so lines of any length are processed in pieces of bounded size.
+    """
+    pattern = reformatter.pattern
+    reformat = reformatter.reformat_text
+    tail = ''
+    for block in blocks:
+        text = tail + block
+        if '\n' not in text and len(text) < 16 * MAX_MATCH:
+            # Too short to find a safe position to split at
+            tail = text
+            continue
+        cut = _split_chunk(text, pattern)
+        write(reformat(text[:cut]))
+        tail = text[cut:]
+    if tail:
+        write(reformat(tail))
+
+
+def _decode(chunks):
+    """Yields the text of the iterable of byte strings `chunks`."""
+    decoder = codecs.getincrementaldecoder(ENCODING)(ERRORS)
+    for data in chunks:
+        yield decoder.decode(data)
+    yield decoder.decode(b'', True)
+
+
+def reformat_stream(reformatter, infile, outfile):
+    """Copies the binary file `infile` to the text file `outfile`, re-rendering timestamps.
+
+    Reads up to `BUFFER_SIZE` bytes at once, but only what is available (if `infile` supports
+    `read1`), so piped input like `tail -f` is passed on without waiting for a full block.
+    """
+    read = infile.read1 if hasattr(infile, 'read1') else infile.read
+    _reformat_blocks(reformatter, _decode(iter(lambda: read(BUFFER_SIZE), b'')), outfile.write)
+
+
+def _split_file(path, parts):
+    """Returns a list of `(start, end)` byte ranges of `path` that begin at line starts."""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, parts):
+            f.seek(max(bounds[-1], size * i // parts))
+            f.readline()
+            pos = f.tell()
+            if pos >= size:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _read_range(raw, start, end):
+    """Yields the bytes between the positions `start` and `end` of `raw` in blocks."""
+    raw.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        data = raw.read(min(BUFFER_SIZE, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
+
+
+def _process_range(job):
+    """Reformats a byte range of a file into a temporary file.
+
+    Returns its path and the number of skipped invalid timestamps.
+    """
+    path, start, end, options = job
+    reformatter = _get_reformatter(options)
+    # The reformatter is reused by the next jobs of this process
+    skipped = reformatter.skipped
+    fd, out_path = tempfile.mkstemp(prefix='format_date-', suffix='.part')
+    try:
+        with open(path, 'rb') as raw:
+            with io.open(fd, 'w', encoding=ENCODING, errors=ERRORS, buffering=BUFFER_SIZE,
+                         newline='') as out:
+                _reformat_blocks(reformatter, _decode(_read_range(raw, start, end)), out.write)
+    except BaseException:
+        os.remove(out_path)
+        raise
+    return out_path, reformatter.skipped - skipped
+
+
+def _reformat_parallel(path, options, pool, parts, outfile):
+    """Returns the number of skipped invalid timestamps."""
+    jobs = [(path, start, end, options) for start, end in _split_file(path, parts)]
+    skipped = 0
+    # imap keeps the order while workers run ahead
+    results = pool.imap(_process_range, jobs)
+    try:
+        for part_path, part_skipped in results:
+            skipped += part_skipped
+            try:
+                with io.open(part_path, 'r', encoding=ENCODING, errors=ERRORS,
+                             newline='') as part:
+                    shutil.copyfileobj(part, outfile, BUFFER_SIZE)
+            finally:
+                os.remove(part_path)
+    except BaseException:
+        # Remove the parts that were written ahead
+        for part_path, _ in results:
+            os.remove(part_path)
+        raise
+    return skipped
+
+
+def _open_output():
+    return io.open(sys.stdout.fileno(), 'w', encoding=ENCODING, errors=ERRORS,
+                   buffering=BUFFER_SIZE, newline='', closefd=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m format_date", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', metavar='FILE',
+                        help="files to read; '-' or none for stdin")
+    parser.add_argument('-f', '--format', default="iso",
+                        help="output format (default: %(default)s)")
+    parser.add_argument('--tz-in', default="local",
+                        help="timezone for timestamps without offset (default: %(default)s)")
+    parser.add_argument('--tz-out', help="timezone to convert all timestamps to")
+    parser.add_argument('--inputs', default="iso,unix",
+                        help="comma-separated timestamp kinds to look for, of: %s "
+                             "(default: %%(default)s)" % ", ".join(sorted(INPUT_PATTERNS)))
+    parser.add_argument('-j', '--workers', type=int, default=1, metavar='N',
+                        help="split large files across N processes (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    options = dict(format=args.format, tz_in=args.tz_in, tz_out=args.tz_out,
+                   inputs=tuple(name.strip() for name in args.inputs.split(',') if name.strip()))
+    try:
+        reformatter = _make_reformatter(options)
+    except Exception as e:
+        parser.error("%s: %s" % (type(e).__name__, e))
+
+    pool = None
+    if args.workers > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(args.workers)
+
+    out = _open_output()
+    # Invalid timestamps of the parallel jobs; the others are counted by `reformatter`
+    skipped = 0
+    try:
+        for path in args.files or ['-']:
+            if path == '-':
+                infile = io.open(sys.stdin.fileno(), 'rb', buffering=BUFFER_SIZE,
+                                 closefd=False)
+                with infile:
+                    reformat_stream(reformatter, infile, out)
+            elif pool and os.path.getsize(path) >= MIN_SPLIT_SIZE:
+                skipped += _reformat_parallel(path, options, pool, args.workers * 4, out)
+            else:
+                with io.open(path, 'rb', buffering=BUFFER_SIZE) as infile:
+                    reformat_stream(reformatter, infile, out)
+    except IOError as e:
+        # Output closed early, e.g. by `head`
+        if e.errno != errno.EPIPE:
+            raise
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        try:
+            out.close()
+        except IOError:
+            pass
+
+    skipped += reformatter.skipped
+    if skipped:
+        sys.stderr.write("format_date: left %d invalid timestamp%s unchanged\n"
+                         % (skipped, "" if skipped == 1 else "s"))
+
+
+if __name__ == '__main__':
+    main()
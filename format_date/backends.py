@@ -0,0 +1,155 @@
+"""Timezone backends that resolve timezone names to tzinfo objects.
+
+`pytz` is always available. The standard library's `zoneinfo` (Python 3.9+) converts faster since
+it needs no `localize`/`normalize` calls, but relies on the system's tz database (or the `tzdata`
+package). `table` reads pytz's zones from a precompiled, memory-mapped zone table (see the
+`zonetable` module) and behaves like pytz. `localize` and `convert` work with the tzinfo objects
+of either backend and render the same local times.
+"""
+
+try:
+    import zoneinfo
+except ImportError:
+    zoneinfo = None
+
+
+class PytzBackend(object):
+    name = 'pytz'
+
+    def __init__(self):
+        from . import load_pytz
+        self._pytz = load_pytz()
+
+    @property
+    def version(self):
+        return self._pytz.OLSON_VERSION
+
+    def timezone(self, name):
+        """Returns the tzinfo object for `name` or `None` if it is unknown."""
+        try:
+            return self._pytz.timezone(name)
+        except self._pytz.UnknownTimeZoneError:
+            return None
+
+    def all_timezones(self):
+        return list(self._pytz.all_timezones)
+
+
+class ZoneInfoBackend(object):
+    name = 'zoneinfo'
+
+    def __init__(self):
+        if zoneinfo is None:
+            raise ValueError("Timezone backend 'zoneinfo' requires Python 3.9 or later")
+
+    @property
+    def version(self):
+        return None
+
+    def timezone(self, name):
+        try:
+            return zoneinfo.ZoneInfo(name)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            return None
+
+    def all_timezones(self):
+        return sorted(zoneinfo.available_timezones())
+
+
+class TableBackend(object):
+    name = 'table'
+
+    def __init__(self, path=None):
+        from . import load_pytz, zonetable
+        path = path or zonetable.default_path()
+        try:
+            self.table = zonetable.ZoneTable(path)
+        except (IOError, OSError):
+            raise ValueError("Timezone backend 'table' requires a zone table at %s; build it with "
+                             "`python -m format_date.zonetable`" % path)
+        # A table of an older tz database would silently render outdated offsets
+        version = load_pytz().OLSON_VERSION
+        if self.table.version != version:
+            raise ValueError("The zone table at %s is of tz database %s, but pytz has %s; rebuild "
+                             "it with `python -m format_date.zonetable`"
+                             % (path, self.table.version, version))
+
+    @property
+    def version(self):
+        return self.table.version
+
+    def timezone(self, name):
+        return self.table.zone(name)
+
+    def all_timezones(self):
+        return list(self.table.names)
+
+
+BACKENDS = {
+    'pytz': PytzBackend,
+    'zoneinfo': ZoneInfoBackend,
+    'table': TableBackend,
+}
+_instances = {}
+
+
+def get_backend(name='pytz'):
+    """Returns the (shared) backend called `name`.
+
+    'auto' selects 'zoneinfo' if it is available and finds the system's tz database, and 'pytz'
+    otherwise.
+    """
+    if name == 'auto':
+        name = 'pytz'
+        if zoneinfo is not None and ZoneInfoBackend().timezone("UTC") is not None:
+            name = 'zoneinfo'
+
+    backend = _instances.get(name)
+    if backend is None:
+        try:
+            cls = BACKENDS[name]
+        except KeyError:
+            raise ValueError("Unknown timezone backend %r" % name)
+        backend = _instances[name] = cls()
+    return backend
+
+
+def localize(dt, tz):
+    """Attaches `tz` to the naive datetime `dt`, keeping its wall time.
+
+    Ambiguous and non-existent wall times are resolved like pytz's `localize(dt, is_dst=False)`.
+    Returns `None` for tzinfo objects that are not from pytz or zoneinfo, which may not implement
+    wall time lookups (like LocalTimezone).
+    """
+    try:
+        return tz.localize(dt)
+    except AttributeError:
+        pass
+
+    if zoneinfo is None or not isinstance(tz, zoneinfo.ZoneInfo):
+        return None
+    first = dt.replace(tzinfo=tz)
+    second = first.replace(fold=1)
+    if first.utcoffset() <= second.utcoffset():
+        # Unambiguous, or non-existent; pytz uses the offset before the transition then
+        return first
+    # Ambiguous: prefer the time without DST, or the later one
+    if first.dst() and not second.dst():
+        return second
+    if second.dst() and not first.dst():
+        return first
+    return second
+
+
+def convert(dt, tz):
+    """Converts the aware datetime `dt` to `tz`."""
+    if dt.tzinfo is tz:
+        # `astimezone` would return `dt` unchanged, even for non-existent wall times
+        dt = tz.fromutc((dt - dt.utcoffset()).replace(tzinfo=tz))
+    else:
+        dt = dt.astimezone(tz)
+    try:
+        return tz.normalize(dt)
+    except AttributeError:
+        # Only pytz needs to be normalized
+        return dt
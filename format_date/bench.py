@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+
+"""Benchmarks for format_date.
+
+Run with `python -m format_date.bench`. Every case is measured against a frozen clock and reported
+as one JSON object per line with ops/sec, p50/p99 latency and allocations per operation, so that
+results of different commits can be compared with `--compare`.
+
+Set `TZ` in the environment to make the 'local' cases reproducible across machines.
+"""
+
+import argparse
+from array import array
+from datetime import datetime
+import json
+import os
+import platform
+import re
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from . import FormatDate, FrozenClock, backends, compiler, load_pytz, zonetable
+from .generate_table import formats as table_formats
+from .timing import clock
+
+
+# 2014-08-12 18:55:00 UTC, the time used for the README table
+FROZEN_TIME = 1407869700.473603
+
+SETTINGS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "insert_date.sublime-settings")
+
+
+def load_prompt_config(path=SETTINGS_FILE):
+    """Reads the default `prompt_config` from the package's settings file."""
+    with open(path) as f:
+        text = f.read()
+    # Strip line comments and trailing commas, which JSON does not allow
+    text = re.sub(r'^\s*//.*$', '', text, flags=re.MULTILINE)
+    text = re.sub(r',(\s*[\]}])', r'\1', text)
+    settings = json.loads(text)
+
+    configs = []
+    for conf in settings['prompt_config']:
+        format = conf.get('format')
+        if format is not None:
+            format = format.replace("$default", settings['format'])
+        configs.append(dict(format=format, tz_in=conf.get('tz_in'), tz_out=conf.get('tz_out')))
+    return configs
+
+
+def _parse(fdate, config):
+    return lambda: fdate.parse(**config)
+
+
+def _cold_parse(config):
+    def run():
+        compiler.clear_cache()
+        FormatDate(clock=FrozenClock(FROZEN_TIME)).parse(**config)
+    return run
+
+
+def build_cases():
+    """Returns a list of `(name, function)` tuples to benchmark."""
+    fdate = FormatDate(clock=FrozenClock(FROZEN_TIME))
+    cases = []
+
+    for config in table_formats:
+        params = ",".join("%s=%s" % item for item in sorted(config.items()) if item[0] != 'format')
+        name = "table %s" % config['format']
+        if params:
+            name += " [%s]" % params
+        cases.append((name, _parse(fdate, config)))
+
+    for format in ("%c", "iso", "unix", "%Y-%m-%d %H:%M:%S"):
+        for tz_in in ("local", "Europe/Berlin"):
+            config = dict(format=format, tz_in=tz_in)
+            cases.append(("warm %s [tz_in=%s]" % (format, tz_in), _parse(fdate, config)))
+            cases.append(("cold %s [tz_in=%s]" % (format, tz_in), _cold_parse(config)))
+
+    cached_fdate = FormatDate(clock=FrozenClock(FROZEN_TIME))
+    cached_fdate.enable_result_cache()
+    for format in ("%c", "%Y-%m-%d", "iso"):
+        config = dict(format=format, tz_in="Europe/Berlin")
+        cases.append(("cached %s [tz_in=Europe/Berlin]" % format, _parse(cached_fdate, config)))
+
+    configs = load_prompt_config()
+    cases.append(("panel parse_many (%d entries)" % len(configs),
+                  lambda: fdate.parse_many(configs)))
+    cases.append(("panel parse loop (%d entries)" % len(configs),
+                  lambda: [fdate.parse(**c) for c in configs]))
+    many = configs * 20
+    for workers in (1, 4):
+        cases.append(("panel parse_many (%d entries, %d workers)" % (len(many), workers),
+                      _parse_many(fdate, many, workers)))
+
+    template = ("${%Y-%m-%d} (UTC ${%H:%M|tz_out=UTC}, "
+                "NY ${%H:%M|tz_out=America/New_York}, #${unix})")
+    cases.append(("template parse (4 fields)", _parse(fdate, dict(format=template))))
+
+    # A day's worth of sorted timestamps, five seconds apart
+    epochs = array('d', (FROZEN_TIME + i * 5 for i in range(-8640, 8640)))
+    for format, tz_out in (("%Y-%m-%d %H:%M:%S.%f%z", "Europe/Berlin"), ("%c", "local")):
+        name = "%s [tz_out=%s] (%d values)" % (format, tz_out, len(epochs))
+        cases.append(("epochs format_epochs " + name,
+                      _format_epochs(fdate, epochs, format, tz_out)))
+        cases.append(("epochs parse_datetime loop " + name,
+                      _epochs_loop(fdate, epochs, format, tz_out)))
+    cases.append(("epochs format_epochs 4 workers (%d values)" % len(epochs),
+                  lambda: fdate.format_epochs(epochs, "%Y-%m-%d %H:%M:%S", "UTC", workers=4)))
+
+    for step, count in (("+1d", 365), ("15m", 96 * 7)):
+        cases.append(("series %s (%d values)" % (step, count),
+                      _series(fdate, count, step, "%Y-%m-%d %H:%M", "Europe/Berlin")))
+
+    for backend in available_backends():
+        backend_fdate = FormatDate(clock=FrozenClock(FROZEN_TIME), backend=backend)
+        for tz_in, tz_out in (("Europe/Berlin", None), ("Europe/Berlin", "America/New_York")):
+            cases.append(("backend %s date_gen [tz_in=%s,tz_out=%s]" % (backend, tz_in, tz_out),
+                          _date_gen(backend_fdate, tz_in, tz_out)))
+    return cases
+
+
+def available_backends():
+    names = ['pytz']
+    if backends.zoneinfo is not None and backends.get_backend('auto').name == 'zoneinfo':
+        names.append('zoneinfo')
+    if os.path.exists(zonetable.default_path()):
+        names.append('table')
+    return names
+
+
+def _parse_many(fdate, configs, workers):
+    return lambda: fdate.parse_many(configs, workers)
+
+
+def _date_gen(fdate, tz_in, tz_out):
+    return lambda: fdate.date_gen(tz_in, tz_out)
+
+
+def _format_epochs(fdate, values, format, tz_out):
+    return lambda: fdate.format_epochs(values, format, tz_out)
+
+
+def _epochs_loop(fdate, values, format, tz_out):
+    tz = fdate.local_tz if tz_out == "local" else fdate.check_tzparam(tz_out, 'tz_out')
+    return lambda: [fdate.parse_datetime(datetime.fromtimestamp(v, tz), format) for v in values]
+
+
+def _series(fdate, count, step, format, tz_out):
+    return lambda: fdate.series(count, step, FROZEN_TIME, format, tz_out=tz_out)
+
+
+def _percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def measure(name, func, iterations, warmup=10):
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(iterations):
+        start = clock()
+        func()
+        samples.append(clock() - start)
+    samples.sort()
+    total = sum(samples)
+
+    result = dict(
+        name=name,
+        iterations=iterations,
+        ops_per_sec=iterations / total if total else None,
+        p50_us=_percentile(samples, 0.50) * 1e6,
+        p99_us=_percentile(samples, 0.99) * 1e6,
+    )
+
+    if tracemalloc:
+        # Measured separately since tracing slows everything down
+        alloc_iterations = max(1, iterations // 10)
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        for _ in range(alloc_iterations):
+            func()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        stats = after.compare_to(before, 'filename')
+        result['alloc_blocks_per_op'] = (sum(max(0, s.count_diff) for s in stats)
+                                         / float(alloc_iterations))
+        result['alloc_bytes_per_op'] = (sum(max(0, s.size_diff) for s in stats)
+                                        / float(alloc_iterations))
+    return result
+
+
+def _load_uncached(backend, name):
+    if backend == 'zoneinfo':
+        return backends.zoneinfo.ZoneInfo.no_cache(name)
+    if backend == 'table':
+        return backends.get_backend('table').table.load(name)
+    pytz = load_pytz()
+    return pytz.tzfile.build_tzinfo(name, pytz.open_resource(name))
+
+
+def zone_memory(backend, names):
+    """Returns the average memory in bytes that `backend` uses per loaded zone of `names`."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    zones = [_load_uncached(backend, name) for name in names]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    size = sum(max(0, s.size_diff) for s in stats)
+    del zones
+    return dict(name="backend %s memory per zone (%d zones)" % (backend, len(names)),
+                bytes_per_zone=size / float(len(names)))
+
+
+def metadata():
+    return dict(
+        name="metadata",
+        python=platform.python_version(),
+        implementation=platform.python_implementation(),
+        platform=platform.platform(),
+        pytz=load_pytz().__version__,
+        tz=os.environ.get('TZ', ""),
+        tzname=list(time.tzname),
+        frozen_time=FROZEN_TIME,
+    )
+
+
+def compare(results, baseline_path):
+    """Returns lines describing the change in ops/sec relative to a previous run."""
+    baseline = {}
+    with open(baseline_path) as f:
+        for line in f:
+            entry = json.loads(line)
+            baseline[entry['name']] = entry
+
+    lines = []
+    for result in results:
+        old = baseline.get(result['name'])
+        if not old or not old.get('ops_per_sec') or not result.get('ops_per_sec'):
+            continue
+        change = (result['ops_per_sec'] / old['ops_per_sec'] - 1) * 100
+        lines.append("%+7.1f%%  %s" % (change, result['name']))
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m format_date.bench", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--iterations', type=int, default=2000,
+                        help="operations per case (default: %(default)s)")
+    parser.add_argument('-k', '--filter', default="",
+                        help="only run cases whose name contains this string")
+    parser.add_argument('-o', '--output', help="write the results to this file")
+    parser.add_argument('--compare', metavar='FILE',
+                        help="compare ops/sec with the results of a previous run")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name, func in build_cases():
+        if args.filter in name:
+            results.append(measure(name, func, args.iterations))
+    if tracemalloc:
+        zones = load_pytz().common_timezones
+        for backend in available_backends():
+            result = zone_memory(backend, zones)
+            if args.filter in result['name']:
+                results.append(result)
+
+    lines = [json.dumps(entry, sort_keys=True) for entry in [metadata()] + results]
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+    else:
+        print("\n".join(lines))
+
+    if args.compare:
+        sys.stderr.write("\n".join(compare(results, args.compare)) + "\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Small caching helpers shared by the modules in this package."""
+
+import threading
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    # Python 2.6 (ST2) has no OrderedDict; eviction order is arbitrary then
+    OrderedDict = dict
+
+
+class LRUCache(object):
+    """A bounded mapping that evicts the least recently used entry when full.
+
+    Only the few operations needed by this package are provided: `get`, `put`, `clear` and
+    `len()`. `hits` and `misses` count the results of `get` calls. All operations are safe to use
+    from several threads.
+    """
+
+    def __init__(self, maxsize=128):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            # Re-insert to mark as most recently used
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            data = self._data
+            if key in data:
+                del data[key]
+            elif len(data) >= self.maxsize:
+                if OrderedDict is dict:
+                    data.popitem()
+                else:
+                    data.popitem(last=False)
+            data[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class ResultCache(object):
+    """A bounded cache of results that are valid for a span of time.
+
+    Entries are stored with the interval `[start, end)` (in nanoseconds) that they are valid for
+    and count as missing outside of it. `hits`, `misses` and `hit_rate` describe the results of
+    `get` calls, `expired` counts the misses caused by an outdated entry.
+    """
+
+    def __init__(self, maxsize=256):
+        self._entries = LRUCache(maxsize)
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    @property
+    def maxsize(self):
+        return self._entries.maxsize
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / float(total) if total else 0.0
+
+    def get(self, key, now, default=None):
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[1] <= now < entry[2]:
+                self.hits += 1
+                return entry[0]
+            self.expired += 1
+        self.misses += 1
+        return default
+
+    def put(self, key, value, start, end):
+        self._entries.put(key, (value, start, end))
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
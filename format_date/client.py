@@ -0,0 +1,177 @@
+"""A client for the format_date daemon that falls back to an in-process FormatDate.
+
+The daemon (see the `daemon` module) keeps pytz, the locales and all caches loaded, so short-lived
+processes like git hooks don't pay for loading them on every run:
+
+    from format_date.client import Client
+    Client().parse("%Y-%m-%d %H:%M", tz_out="UTC")
+
+If the daemon is not running (or Unix sockets are not available, as on Windows), requests are
+rendered by a local `FormatDate` instead and the socket is tried again after `retry_interval`
+seconds. Pass the defaults the daemon was started with as `default`, so that both render the same.
+
+The protocol consists of one JSON object per line in both directions. Requests have an `id`, an
+`op` (`parse`, `parse_many` or `ping`) and `args`: the parameters of `parse` as an object or the
+list of configurations for `parse_many`. Responses repeat the `id` and carry either `ok` with the
+result or `error` with a `[type name, message]` pair. Results of `parse_many` are lists of
+`[text, error]` pairs.
+"""
+
+import json
+import os
+import socket
+import tempfile
+import time
+
+from . import FormatDate, UnknownLocaleError, UnknownTimeZoneError
+
+
+# Parameters of `FormatDate.parse` that are sent to the daemon
+PARAMETERS = ('format', 'tz_in', 'tz_out', 'locale')
+
+# Error types that are raised again by the client under their own name
+ERRORS = dict((cls.__name__, cls) for cls in (UnknownTimeZoneError, UnknownLocaleError,
+                                              ValueError, TypeError, KeyError))
+
+
+class RemoteError(Exception):
+    """Raised for errors of the daemon whose type is not in `ERRORS`."""
+
+
+def default_socket_path():
+    """Returns the socket path used by the daemon and client unless told otherwise.
+
+    `FORMAT_DATE_SOCKET` overrides it.
+    """
+    path = os.environ.get('FORMAT_DATE_SOCKET')
+    if path:
+        return path
+    directory = os.environ.get('XDG_RUNTIME_DIR')
+    if directory:
+        return os.path.join(directory, "format_date.sock")
+    # Shared temp directories need a name per user
+    if hasattr(os, 'getuid'):
+        return os.path.join(tempfile.gettempdir(), "format_date-%d.sock" % os.getuid())
+    return os.path.join(tempfile.gettempdir(), "format_date.sock")
+
+
+def encode_error(e):
+    return [type(e).__name__, str(e).strip('"')]
+
+
+def decode_error(error):
+    name, message = error
+    return ERRORS.get(name, RemoteError)(message)
+
+
+class Client(object):
+    """Sends `parse` and `parse_many` requests to the daemon listening on `path`.
+
+    `default` holds the defaults for `format`, `tz_in` and `locale`, like the daemon's options. They
+    are sent along with every request, so the results do not depend on the daemon's defaults.
+    `fallback` is the FormatDate used while the daemon is unavailable and is created on first use
+    with `default`. Instances are not thread-safe; use one client per thread.
+    """
+
+    retry_interval = 5.0
+
+    def __init__(self, path=None, timeout=1.0, fallback=None, default=None):
+        self.path = path or default_socket_path()
+        self.timeout = timeout
+        self.default = dict(default or {})
+        self._fallback = fallback
+        self._sock = None
+        self._file = None
+        self._next_id = 0
+        # Time before which the daemon is not tried again
+        self._retry_at = 0
+
+    @property
+    def fallback(self):
+        if self._fallback is None:
+            self._fallback = FormatDate(default=self.default)
+        return self._fallback
+
+    @property
+    def connected(self):
+        return self._sock is not None
+
+    def _connect(self):
+        if self._sock is not None:
+            return True
+        if time.time() < self._retry_at or not hasattr(socket, 'AF_UNIX'):
+            return False
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except (socket.error, OSError):
+            sock.close()
+            self._retry_at = time.time() + self.retry_interval
+            return False
+        self._sock = sock
+        self._file = sock.makefile('rb')
+        return True
+
+    def close(self):
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+            self._sock = self._file = None
+
+    def _request(self, op, args):
+        """Returns the response to a request or `None` if the daemon could not be reached."""
+        if not self._connect():
+            return None
+        self._next_id += 1
+        request = dict(id=self._next_id, op=op, args=args)
+        try:
+            self._sock.sendall(json.dumps(request, separators=(',', ':')).encode('utf-8') + b"\n")
+            line = self._file.readline()
+        except (socket.error, OSError):
+            line = b""
+        if not line:
+            # The daemon went away (or timed out); it is tried again on the next request
+            self.close()
+            return None
+        response = json.loads(line.decode('utf-8'))
+        if response.get('id') != request['id']:
+            self.close()
+            raise RemoteError("Response does not match the request")
+        return response
+
+    def ping(self):
+        """Returns whether the daemon responds."""
+        return self._request('ping', None) is not None
+
+    def _params(self, config):
+        params = dict((k, config.get(k)) for k in PARAMETERS)
+        for k, v in self.default.items():
+            if params.get(k) is None:
+                params[k] = v
+        return params
+
+    def parse(self, format=None, tz_in=None, tz_out=None, locale=None):
+        args = self._params(dict(format=format, tz_in=tz_in, tz_out=tz_out, locale=locale))
+        response = self._request('parse', args)
+        if response is None:
+            return self.fallback.parse(**args)
+        if 'error' in response:
+            raise decode_error(response['error'])
+        return response['ok']
+
+    def parse_many(self, configs):
+        """Like `FormatDate.parse_many`, returning `(text, exception)` tuples."""
+        configs = [self._params(c) for c in configs]
+        response = self._request('parse_many', configs)
+        if response is None:
+            return self.fallback.parse_many(configs)
+        if 'error' in response:
+            raise decode_error(response['error'])
+        return [(text, decode_error(error) if error else None) for text, error in response['ok']]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
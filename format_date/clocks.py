@@ -0,0 +1,87 @@
+"""Sources of the current time for FormatDate.
+
+A clock provides `time_ns()`, the nanoseconds since the epoch as an integer, and `time()`, the
+seconds as a float like `time.time()`.
+"""
+
+import time
+
+from .timing import clock as perf_clock
+
+
+class SystemClock(object):
+    """Reads the system's clock on every call, with nanosecond precision where available."""
+
+    if hasattr(time, 'time_ns'):
+        def time_ns(self):
+            return time.time_ns()
+    else:
+        def time_ns(self):
+            return int(time.time() * 1e9)
+
+    def time(self):
+        return time.time()
+
+    def __repr__(self):
+        return "%s()" % type(self).__name__
+
+
+class FrozenClock(object):
+    """Always returns the same point in time, `stamp` seconds since the epoch.
+
+    Use `set()` or `advance()` to move it.
+    """
+
+    def __init__(self, stamp=0):
+        self.set(stamp)
+
+    def set(self, stamp):
+        self._ns = int(round(stamp * 1e9))
+
+    def set_ns(self, ns):
+        self._ns = int(ns)
+
+    def advance(self, seconds):
+        self._ns += int(round(seconds * 1e9))
+
+    def time_ns(self):
+        return self._ns
+
+    def time(self):
+        return self._ns / 1e9
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, self.time())
+
+
+class CoarseClock(object):
+    """Serves all calls within one tick from a single reading of `source`.
+
+    A new tick starts with `tick()` or, if `max_age` is given, once the last reading is older than
+    `max_age` seconds. Without a tick, the first call takes the reading.
+    """
+
+    def __init__(self, source=None, max_age=None):
+        self.source = source if source is not None else SystemClock()
+        self.max_age = max_age
+        self._ns = None
+        self._read_at = None
+
+    def tick(self):
+        """Takes a new reading and returns it in nanoseconds."""
+        self._ns = self.source.time_ns()
+        if self.max_age is not None:
+            self._read_at = perf_clock()
+        return self._ns
+
+    def time_ns(self):
+        if (self._ns is None
+                or (self.max_age is not None and perf_clock() - self._read_at >= self.max_age)):
+            return self.tick()
+        return self._ns
+
+    def time(self):
+        return self.time_ns() / 1e9
+
+    def __repr__(self):
+        return "%s(%r, max_age=%r)" % (type(self).__name__, self.source, self.max_age)
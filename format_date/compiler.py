@@ -0,0 +1,320 @@
+"""Compiles format strings into reusable renderers.
+
+A compiled format consists of literal chunks and field emitters. Fields that can be computed
+directly from the datetime's attributes (`%Y`, `%m`, `%H`, ...) are emitted without going through
+`strftime`, everything locale-dependent (`%c`, `%a`, `%p`, ...) is delegated to `strftime` one
+field at a time. The output is identical to `dt.strftime(format)`.
+
+With a locale (see `locales.load_locale`), `%c`, `%x`, `%X` and `%r` are expanded to the locale's
+patterns and names are taken from its table instead of the process' locale.
+
+Fields using glibc extensions (flags, widths and `E`/`O` modifiers like `%-d` or `%Ey`) are
+delegated to `strftime` one at a time as well, except for names taken from a locale's table.
+Formats with a trailing `%` are passed to `strftime` as a whole.
+
+`strftime` reads the process' LC_TIME, so it is only called while holding
+`locales.setlocale_lock`.
+"""
+
+import calendar
+import re
+import sys
+import time
+
+from .cache import LRUCache
+from .locales import load_locale, setlocale_lock
+
+
+ST2 = sys.version_info[0] == 2
+
+# Size of the renderer cache, keyed by format string and locale
+CACHE_SIZE = 128
+
+_cache = LRUCache(CACHE_SIZE)
+
+
+def _year(dt):
+    if dt.year < 1000:
+        # Padding of small years is platform-dependent
+        return dt.strftime("%Y")
+    return str(dt.year)
+
+
+def _hour12(dt):
+    return "%02d" % (dt.hour % 12 or 12)
+
+
+def _yday(dt):
+    return "%03d" % (dt.toordinal() - dt.replace(month=1, day=1).toordinal() + 1)
+
+
+def _utcoffset(dt):
+    offset = dt.utcoffset()
+    if offset is None:
+        return ""
+    seconds = offset.days * 86400 + offset.seconds
+    if seconds % 60 or offset.microseconds:
+        # Sub-minute offsets are rendered differently across Python versions
+        return dt.strftime("%z")
+    sign = '+'
+    if seconds < 0:
+        sign = '-'
+        seconds = -seconds
+    return "%s%02d%02d" % (sign, seconds // 3600, seconds // 60 % 60)
+
+
+def _tzname(dt):
+    return dt.tzname() or ""
+
+
+# Fields that do not depend on the locale
+_FIELDS = {
+    'd': lambda dt: "%02d" % dt.day,
+    'm': lambda dt: "%02d" % dt.month,
+    'y': lambda dt: "%02d" % (dt.year % 100),
+    'Y': _year,
+    'H': lambda dt: "%02d" % dt.hour,
+    'I': _hour12,
+    'M': lambda dt: "%02d" % dt.minute,
+    'S': lambda dt: "%02d" % dt.second,
+    'f': lambda dt: "%06d" % dt.microsecond,
+    'j': _yday,
+    'z': _utcoffset,
+    'Z': _tzname,
+}
+
+
+# Smallest interval (in seconds) after which a field's output can change, 0 for sub-second fields.
+# Fields not listed here are assumed to change once per day at most,
+# except for unknown ones which are treated like seconds.
+_RESOLUTIONS = {
+    'f': 0,
+    'S': 1, 's': 1, 'c': 1, 'X': 1, 'T': 1, 'r': 1,
+    'M': 60, 'R': 60, 'z': 60, 'Z': 60,
+    'H': 3600, 'I': 3600, 'k': 3600, 'l': 3600, 'p': 3600, 'P': 3600,
+}
+_DAY_FIELDS = 'aAbBCdDeFgGhjmuUVwWxyY'
+
+
+def field_resolution(c):
+    """Returns the interval in seconds after which the output of the field `%c` may change.
+
+    `c` may include flags and modifiers, like "-d".
+    """
+    c = c[-1]
+    if c in _RESOLUTIONS:
+        return _RESOLUTIONS[c]
+    if c in _DAY_FIELDS:
+        return 86400
+    return 1
+
+
+def _delegate(spec):
+    def field(dt):
+        # Another thread may be switching LC_TIME to load a locale table
+        with setlocale_lock:
+            return dt.strftime(spec)
+    return field
+
+
+def _strftime_renderer(format):
+    def render(dt):
+        with setlocale_lock:
+            return dt.strftime(format)
+    return render
+
+
+def _flagged_name(emit, c, flags, width):
+    """Applies the glibc `flags` and `width` of the field `%c` to the names returned by `emit`."""
+    upper = '^' in flags or ('#' in flags and c != 'p')
+    lower = '#' in flags and c == 'p'
+    width = int(width or 0)
+    fill = '0' if flags.rfind('0') > flags.rfind('_') else ' '
+    if '-' in flags:
+        width = 0
+
+    def field(dt):
+        text = emit(dt)
+        if upper:
+            text = text.upper()
+        elif lower:
+            text = text.lower()
+        return text.rjust(width, fill)
+    return field
+
+
+def _iso_renderer(sep):
+    def render(dt):
+        # Set microseconds to 0 because they are practically useless and only add noise
+        return dt.replace(microsecond=0).isoformat(sep)
+    return render
+
+
+# Custom formats for the time since the epoch, with the number of units per second
+UNIX_FORMATS = {'unix': 1, 'unix_ms': 10 ** 3, 'unix_us': 10 ** 6, 'unix_ns': 10 ** 9}
+
+
+def _unix_seconds(dt):
+    if dt.utcoffset() is None:
+        return int(time.mktime(dt.timetuple()))
+    return calendar.timegm(dt.utctimetuple())
+
+
+def _unix_renderer(dt):
+    return str(_unix_seconds(dt))
+
+
+def _unix_fraction_renderer(units):
+    def render(dt):
+        # datetime objects only have microseconds, so units below that are always 0
+        micros = _unix_seconds(dt) * 10 ** 6 + dt.microsecond
+        return str(micros * units // 10 ** 6)
+    return render
+
+
+class CompiledFormat(object):
+    """A format string split into literal chunks and field emitters.
+
+    Calling the object with a datetime renders it. `fields` holds the conversion characters of all
+    fields in order of appearance, preceded by their flags and modifiers if any (like "-d"), and
+    `resolution` the interval in seconds after which the output may change (see
+    `format_resolution`).
+    """
+
+    def __init__(self, format, template, emitters, fields):
+        self.format = format
+        self.fields = fields
+        self._template = template
+        self._emitters = tuple(emitters)
+
+        resolution = None
+        for c in fields:
+            r = field_resolution(c)
+            if resolution is None or r < resolution:
+                resolution = r
+        self.resolution = resolution
+
+    def __call__(self, dt):
+        return self._template % tuple([emit(dt) for emit in self._emitters])
+
+    def render_partial(self, dt, keep):
+        """Renders all fields except those in `keep` and returns the result as a template.
+
+        The returned string has a `%s` placeholder for each kept field (in order) and can be
+        completed with the `%` operator.
+        """
+        values = []
+        for c, emit in zip(self.fields, self._emitters):
+            if c in keep:
+                values.append('%s')
+            else:
+                values.append(emit(dt).replace('%', '%%'))
+        return self._template.replace('%%', '%%%%') % tuple(values)
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, self.format)
+
+
+# Flags, width and modifier of a field, like in `%-d`, `%_5B` or `%Ey`
+_spec_re = re.compile(r'([-_0^#]*)(\d*)([EO]?)([A-Za-z])')
+
+
+def _compile_strftime(format, table=None):
+    """Returns a CompiledFormat or None if the format needs to go through strftime as a whole.
+
+    Names are taken from the LocaleTable `table`, if given.
+    """
+    names = table.emitters if table is not None else {}
+    chunks = []
+    emitters = []
+    fields = []
+    i = 0
+    length = len(format)
+    while i < length:
+        j = format.find('%', i)
+        if j == -1:
+            chunks.append(format[i:])
+            break
+        chunks.append(format[i:j])
+        if j + 1 >= length:
+            return None
+        c = format[j + 1]
+        if c == '%':
+            chunks.append('%%')
+            i = j + 2
+            continue
+
+        m = _spec_re.match(format, j + 1)
+        if m is None:
+            return None
+        flags, width, modifier, c = m.groups()
+        chunks.append('%s')
+        if m.end() == j + 2:
+            emitters.append(_FIELDS.get(c) or names.get(c) or _delegate(str('%' + c)))
+        elif c in names:
+            # The table has no alternative names, so `E` and `O` are ignored
+            emitters.append(_flagged_name(names[c], c, flags, width))
+        else:
+            emitters.append(_delegate(str('%' + m.group(0))))
+        fields.append(m.group(0))
+        i = m.end()
+
+    template = ''.join(chunks)
+    if ST2:
+        template = str(template)  # convert from unicode (ST2)
+    return CompiledFormat(format, template, emitters, fields)
+
+
+def compile_format(format, locale=None):
+    """Compiles `format` into a callable that renders a datetime object.
+
+    Supports the custom 'iso', 'iso:X', 'unix', 'unix_ms', 'unix_us' and 'unix_ns' formats in
+    addition to strftime's syntax.
+    `locale` is the name of a locale to render names and `%c`, `%x`, `%X` and `%r` in, instead of
+    the process' locale. Results are kept in a bounded LRU cache keyed by the format string and
+    locale.
+    """
+    key = format if locale is None else (format, locale)
+    render = _cache.get(key)
+    if render is not None:
+        return render
+
+    # 'iso', 'iso:T'
+    if format.startswith("iso"):
+        sep = 'T'
+        if len(format) == 5 and format[3] == ':':
+            sep = str(format[-1])  # convert from unicode (ST2)
+        render = _iso_renderer(sep)
+    # 'unix'
+    elif format == "unix":
+        render = _unix_renderer
+    elif format in UNIX_FORMATS:
+        render = _unix_fraction_renderer(UNIX_FORMATS[format])
+    elif locale is None:
+        render = _compile_strftime(format) or _strftime_renderer(format)
+    else:
+        table = load_locale(locale)
+        expanded = table.expand(format)
+        render = _compile_strftime(expanded, table) or _strftime_renderer(expanded)
+
+    _cache.put(key, render)
+    return render
+
+
+def format_resolution(format, locale=None):
+    """Returns the interval in seconds after which the output of `format` may change.
+
+    This is one of 0 (sub-second), 1, 60, 3600 and 86400, or `None` if the format contains no
+    time-dependent fields at all.
+    """
+    render = compile_format(format, locale)
+    if isinstance(render, CompiledFormat):
+        return render.resolution
+    if render is _unix_renderer or format.startswith("iso"):
+        return 1
+    # Formats passed to strftime as a whole
+    return 0
+
+
+def clear_cache():
+    _cache.clear()
@@ -0,0 +1,164 @@
+"""A long-lived server that renders dates for other processes over a Unix socket.
+
+Usage: python -m format_date.daemon [options]
+
+Keeps pytz, the locales and the caches of timezones and compiled formats loaded across requests
+from any number of concurrent clients. See the `client` module for the protocol and a client that
+falls back to rendering in-process. Requires Python 3.5 or later.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+
+from . import FormatDate
+from .client import PARAMETERS, default_socket_path, encode_error
+
+
+# Requests longer than this (in bytes) close the connection
+MAX_REQUEST_SIZE = 1 << 20
+
+
+class Daemon(object):
+    """Answers requests with `fdate`, a FormatDate instance shared by all connections.
+
+    Requests are rendered on the event loop's thread; they take microseconds once the caches are
+    warm, which is less than handing them to another thread would cost.
+    """
+
+    def __init__(self, fdate=None):
+        self.fdate = fdate if fdate is not None else FormatDate()
+        self.requests = 0
+
+    def _params(self, args):
+        if not isinstance(args, dict) or not set(args).issubset(PARAMETERS):
+            raise TypeError("Expected an object with any of the keys %s" % ", ".join(PARAMETERS))
+        return args
+
+    def handle(self, request):
+        """Returns the response to a decoded request."""
+        response = dict(id=request.get('id'))
+        op = request.get('op')
+        args = request.get('args')
+        self.requests += 1
+        try:
+            if op == 'parse':
+                response['ok'] = self.fdate.parse(**self._params(args))
+            elif op == 'parse_many':
+                if not isinstance(args, list):
+                    raise TypeError("Expected a list of configurations")
+                results = self.fdate.parse_many([self._params(c) for c in args])
+                response['ok'] = [[text, encode_error(e) if e else None] for text, e in results]
+            elif op == 'ping':
+                response['ok'] = "pong"
+            else:
+                raise ValueError("Unknown operation %r" % op)
+        except Exception as e:
+            response['error'] = encode_error(e)
+        return response
+
+    async def serve_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line.decode('utf-8'))
+                    if not isinstance(request, dict):
+                        raise ValueError("Expected a JSON object")
+                except ValueError as e:
+                    response = dict(id=None, error=encode_error(e))
+                else:
+                    response = self.handle(request)
+                writer.write(json.dumps(response, separators=(',', ':')).encode('utf-8') + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError, asyncio.LimitOverrunError):
+            # Disconnected or sent an oversized line
+            pass
+        finally:
+            writer.close()
+
+
+def _remove_stale_socket(path):
+    """Removes the socket file at `path` unless another daemon is listening on it."""
+    if not os.path.exists(path):
+        return
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise RuntimeError("Another daemon is already listening on %s" % path)
+    finally:
+        sock.close()
+
+
+async def serve(path, daemon):
+    """Serves `daemon` on the Unix socket `path` until cancelled."""
+    _remove_stale_socket(path)
+    # Only the current user may connect
+    umask = os.umask(0o177)
+    try:
+        server = await asyncio.start_unix_server(daemon.serve_client, path,
+                                                 limit=MAX_REQUEST_SIZE)
+    finally:
+        os.umask(umask)
+
+    try:
+        if hasattr(server, 'serve_forever'):
+            await server.serve_forever()
+        else:
+            # Python < 3.7 serves as soon as the server is started
+            await asyncio.Event().wait()
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m format_date.daemon", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--socket', default=default_socket_path(),
+                        help="path of the Unix socket (default: %(default)s)")
+    parser.add_argument('-f', '--format', default="%c",
+                        help="default format (default: %(default)s)")
+    parser.add_argument('--tz-in', default="local",
+                        help="default tz_in (default: %(default)s)")
+    parser.add_argument('--locale', help="default locale")
+    parser.add_argument('--backend', default="pytz",
+                        help="timezone backend: pytz, zoneinfo, table or auto "
+                             "(default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    try:
+        fdate = FormatDate(default=dict(format=args.format, tz_in=args.tz_in, locale=args.locale),
+                           backend=args.backend)
+        # Load pytz and the locale before the first client has to wait for them
+        fdate.parse()
+    except Exception as e:
+        parser.error("%s: %s" % (type(e).__name__, e))
+
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(serve(args.socket, Daemon(fdate)))
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, task.cancel)
+    sys.stderr.write("Listening on %s\n" % args.socket)
+    try:
+        loop.run_until_complete(task)
+    except asyncio.CancelledError:
+        pass
+    except RuntimeError as e:
+        parser.exit(1, "%s\n" % e)
+    finally:
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""Formats series of unix timestamps without building a datetime object for every value.
+
+Timestamps are grouped into segments, i.e. ranges of seconds that share the same local date, UTC
+offset and timezone name. The fields that only depend on those (`%Y`, `%b`, `%z`, ...) are rendered
+once per segment into a template, and only the remaining time-of-day fields are rendered per value.
+"""
+
+from datetime import datetime
+import locale
+import sys
+
+from .compiler import UNIX_FORMATS, CompiledFormat, compile_format, field_resolution, \
+    format_resolution
+
+
+ST2 = sys.version_info[0] == 2
+
+# datetime(1970, 1, 1).toordinal()
+EPOCH_ORDINAL = 719163
+
+# Fields that only depend on the UTC offset, which is constant within a segment
+_SEGMENT_FIELDS = 'zZ'
+
+# Fields rendered from the time of day without a datetime object
+_TIME_FIELDS = {
+    'H': lambda h, m, s, us: "%02d" % h,
+    'I': lambda h, m, s, us: "%02d" % (h % 12 or 12),
+    'M': lambda h, m, s, us: "%02d" % m,
+    'S': lambda h, m, s, us: "%02d" % s,
+    'f': lambda h, m, s, us: "%06d" % us,
+}
+
+
+def _decode(text):
+    # Fix potential unicode/codepage issues, like `FormatDate.parse_datetime`
+    if ST2 and isinstance(text, str):
+        try:
+            return text.decode(locale.getpreferredencoding())
+        except UnicodeDecodeError:
+            return text.decode('utf-8')
+    return text
+
+
+class EpochFormatter(object):
+    """Renders unix timestamps with `format` in the timezone `tz`.
+
+    `format` and `locale` accept the same values as for `FormatDate.date_format` and `tz` is
+    a tzinfo object.
+    Call `iterate(values)` with a sequence of numbers, such as a list, an `array.array`,
+    a memoryview or a NumPy array. Values do not need to be sorted, but sorted series benefit the
+    most since each segment only has to be set up once.
+    """
+
+    def __init__(self, format, tz, locale=None):
+        self.format = format
+        self.tz = tz
+        self.locale = locale
+        self.segments = 0
+
+        render = compile_format(format, locale)
+        self._render = render
+        # Units per second for the 'unix' formats, which are rendered directly
+        self._unix = UNIX_FORMATS.get(format)
+        self._resolution = format_resolution(format, locale)
+        self._compiled = None
+        if isinstance(render, CompiledFormat):
+            keep = set(c for c in render.fields
+                       if c not in _SEGMENT_FIELDS and field_resolution(c) < 86400)
+            self._compiled = render
+            self._keep = keep
+            self._fields = [c for c in render.fields if c in keep]
+            self._emitters = [_TIME_FIELDS.get(c) for c in self._fields]
+            # Emitters of the compiled format, for the fields that need a datetime object
+            self._dt_emitters = [emit for c, emit in zip(render.fields, render._emitters)
+                                 if c in keep]
+            # Only build datetime objects if a kept field needs strftime
+            self._needs_dt = None in self._emitters
+            self._resolution = min(field_resolution(c) for c in keep) if keep else 86400
+
+        # Current segment: [start, end) in UTC seconds
+        self._start = self._end = 0
+        self._day_start = 0
+        self._dt = None
+        self._template = None
+
+    def _state(self, stamp):
+        dt = datetime.fromtimestamp(stamp, self.tz)
+        # The wall clock's distance to UTC usually equals the offset, but not for tzinfo objects
+        # using the default `fromutc` within an ambiguous hour (like LocalTimezone)
+        wall = ((dt.toordinal() - EPOCH_ORDINAL) * 86400
+                + dt.hour * 3600 + dt.minute * 60 + dt.second)
+        return dt, (dt.utcoffset(), dt.tzname(), wall - stamp)
+
+    def _boundary(self, lo, hi):
+        """Returns the first second in (lo, hi] whose state differs from the one at `lo`.
+
+        The states at `lo` and `hi` must differ.
+        """
+        lo_state = self._state(lo)[1]
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if self._state(mid)[1] == lo_state:
+                lo = mid
+            else:
+                hi = mid
+        return hi
+
+    def _enter(self, stamp):
+        """Sets up the segment containing the UTC second `stamp`."""
+        dt, state = self._state(stamp)
+        day_start = stamp - (dt.hour * 3600 + dt.minute * 60 + dt.second)
+        start, end = day_start, day_start + 86400
+
+        # Shrink the day to the range with the same offset and name
+        if self._state(start)[1] != state:
+            start = self._boundary(start, stamp)
+        if self._state(end - 1)[1] != state:
+            end = self._boundary(stamp, end - 1)
+
+        self._start = start
+        self._end = end
+        self._day_start = day_start
+        self._dt = dt
+        if self._compiled is not None:
+            self._template = self._compiled.render_partial(dt, self._keep)
+        self.segments += 1
+
+    def iterate(self, values):
+        """Yields the rendered text of each value in `values`."""
+        unix = self._unix
+        compiled = self._compiled
+        if compiled is not None:
+            emitters = self._emitters
+            dt_emitters = self._dt_emitters
+            needs_dt = self._needs_dt
+        resolution = self._resolution
+        last_key = None
+        text = None
+
+        for value in values:
+            secs = int(value // 1)
+            us = int(round((value - secs) * 1e6))
+            if us >= 1000000:
+                secs += 1
+                us -= 1000000
+
+            if unix == 1:
+                yield str(secs)
+                continue
+            if unix:
+                yield str((secs * 1000000 + us) * unix // 1000000)
+                continue
+
+            if not self._start <= secs < self._end:
+                self._enter(secs)
+                last_key = None
+
+            seconds = secs - self._day_start
+            if resolution:
+                # Values within the same interval render to the same text
+                key = seconds // resolution
+                if key == last_key:
+                    yield text
+                    continue
+                last_key = key
+
+            h, seconds = divmod(seconds, 3600)
+            m, s = divmod(seconds, 60)
+            if compiled is None:
+                dt = self._dt.replace(hour=h, minute=m, second=s, microsecond=us)
+                text = _decode(self._render(dt))
+            elif needs_dt:
+                dt = self._dt.replace(hour=h, minute=m, second=s, microsecond=us)
+                text = _decode(self._template % tuple([
+                    emit(h, m, s, us) if emit else dt_emit(dt)
+                    for emit, dt_emit in zip(emitters, dt_emitters)]))
+            else:
+                text = _decode(self._template
+                               % tuple([emit(h, m, s, us) for emit in emitters]))
+            yield text
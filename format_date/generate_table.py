@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 
-"""This is just the code I use to generate the example table rows for the readme."""
+"""This is just the code I use to generate the example table rows for the readme.
 
-from __init__ import FormatDate
+Run with `python -m format_date.generate_table`.
+"""
+
+from . import FormatDate
 
 formats = [
     { 'format': "%d/%m/%Y %I:%M %p"},
@@ -23,28 +26,36 @@ formats = [
       'tz_out': "America/New_York"},
     { 'format': "unix"}
 ]
-fdate = FormatDate()
-formatted = []
-for fmt in formats:
-    formatted.append(fdate.parse(**fmt))
 
-ftext = []
-for s, fmt in zip(formatted, formats):
-    params = fmt.copy()
-    del params['format']
-    params = "`%s`" % params if params else ''
-    ftext.append("|`%s`|%s|%s|" % (fmt['format'], params, s))
 
-text = '\n'.join(ftext)
+def generate_table():
+    fdate = FormatDate()
+    formatted = []
+    for fmt in formats:
+        formatted.append(fdate.parse(**fmt))
 
+    ftext = []
+    for s, fmt in zip(formatted, formats):
+        params = fmt.copy()
+        del params['format']
+        params = "`%s`" % params if params else ''
+        ftext.append("|`%s`|%s|%s|" % (fmt['format'], params, s))
 
-if __name__ != '__main__':
-    import sublime_plugin
+    return '\n'.join(ftext)
 
-    class TableGenCommand(sublime_plugin.TextCommand):
-        def run(self, edit):
-            self.view.insert(edit, self.view.sel()[0].begin(), text)
+
+if __name__ != '__main__':
+    try:
+        import sublime_plugin
+    except ImportError:
+        # Imported outside of Sublime Text, e.g. by the benchmarks
+        pass
+    else:
+        class TableGenCommand(sublime_plugin.TextCommand):
+            def run(self, edit):
+                self.view.insert(edit, self.view.sel()[0].begin(), generate_table())
 else:
+    text = generate_table()
     # Put on clipboard
     from tkinter import Tk
     r = Tk()
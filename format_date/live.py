@@ -0,0 +1,109 @@
+"""Keeps rendered configurations up to date while only re-rendering what changed."""
+
+from .compiler import format_resolution
+from .templates import compile_template, is_template
+
+
+# Compares unequal to everything, including itself
+class _Always(object):
+    def __eq__(self, other):
+        return False
+
+    def __ne__(self, other):
+        return True
+
+_ALWAYS = _Always()
+
+# Number of leading datetime fields that identify an interval of the given resolution
+_KEY_FIELDS = {1: 6, 60: 5, 3600: 4, 86400: 3}
+
+
+def _interval_key(dt, resolution):
+    if resolution is None:
+        return ()
+    if resolution == 0:
+        return _ALWAYS
+    fields = (dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second)
+    # Also include the offset and name so that DST transitions are noticed
+    return fields[:_KEY_FIELDS[resolution]] + (dt.utcoffset(), dt.tzname())
+
+
+class LiveParse(object):
+    """Renders configurations like `FormatDate.parse_many` and keeps the results current.
+
+    `configs` is a sequence of dicts with the parameters of `FormatDate.parse`. After each call to
+    `update()`, `results` holds a `(text, exception)` tuple for every configuration. Only items
+    whose output may have changed since the previous update are rendered again, based on the
+    resolution of their format (seconds, minutes, hours, days or static).
+    """
+
+    def __init__(self, fdate, configs):
+        self.fdate = fdate
+        self.configs = list(configs)
+        self.results = [(None, None)] * len(self.configs)
+        self._keys = [_ALWAYS] * len(self.configs)
+        self._resolutions = []
+        for config in self.configs:
+            format = config.get('format')
+            if format is None:
+                format = fdate.default['format']
+            locale = config.get('locale')
+            if locale is None:
+                locale = fdate.default['locale']
+            try:
+                if is_template(format):
+                    resolution = compile_template(format).resolution(fdate.default['format'],
+                                                                     locale)
+                else:
+                    resolution = format_resolution(format, locale)
+            except Exception:
+                resolution = 0
+            self._resolutions.append(resolution)
+
+    def update(self, now=None):
+        """Re-renders outdated items and returns a list of the indices whose result changed."""
+        if now is None:
+            now = self.fdate.clock.time()
+
+        fdate = self.fdate
+        converted = {}
+        changed = []
+        for i, config in enumerate(self.configs):
+            format = config.get('format')
+            try:
+                if format == "unix":
+                    key = int(now)
+                    if key == self._keys[i]:
+                        continue
+                    text = str(key)
+                else:
+                    tz_key = (config.get('tz_in'), config.get('tz_out'))
+                    dt = converted.get(tz_key)
+                    if dt is None:
+                        dt = converted[tz_key] = fdate.date_gen(tz_key[0], tz_key[1], now)
+                    key = _interval_key(dt, self._resolutions[i])
+                    if key == self._keys[i]:
+                        continue
+                    if is_template(format or fdate.default['format']):
+                        text = fdate.parse_template(format, tz_key[0], tz_key[1],
+                                                    config.get('locale'), now)
+                    else:
+                        text = fdate.parse_datetime(dt, format, config.get('locale'))
+            except Exception as e:
+                result = (None, e)
+                key = _ALWAYS
+            else:
+                result = (text, None)
+
+            self._keys[i] = key
+            if not _same_result(result, self.results[i]):
+                self.results[i] = result
+                changed.append(i)
+        return changed
+
+
+def _same_result(a, b):
+    if a[1] is not None and b[1] is not None:
+        # Errors are raised anew on every update
+        return type(a[1]) is type(b[1]) and str(a[1]) == str(b[1])
+    return a == b
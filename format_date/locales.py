@@ -0,0 +1,189 @@
+"""Locale tables for rendering dates in a specific locale without changing the process' locale.
+
+A table holds the day and month names, the AM/PM strings and the `%c`, `%x`, `%X` and `%r` patterns
+of a locale. Loading a table requires switching LC_TIME once, after which it can be used from any
+thread and side by side with tables of other locales.
+"""
+
+from datetime import datetime, timedelta
+import locale
+import re
+import sys
+import threading
+
+from .cache import LRUCache
+
+
+ST2 = sys.version_info[0] == 2
+
+# Maximum number of locale tables kept in memory
+CACHE_SIZE = 16
+
+_cache = LRUCache(CACHE_SIZE)
+# Guards the cache and all changes of LC_TIME, including the temporary ones while loading a table
+setlocale_lock = threading.Lock()
+
+# Patterns that are replaced by the table's patterns before a format is compiled
+_PATTERN_FIELDS = {'c': 'd_t_fmt', 'x': 'd_fmt', 'X': 't_fmt', 'r': 't_fmt_ampm'}
+_pattern_re = re.compile(r'%[%cxXr]|%E[cxX]')
+
+
+class UnknownLocaleError(ValueError):
+    """Raised for locale names that are not available on the system."""
+
+
+class LocaleTable(object):
+    """The locale-dependent parts of LC_TIME for the locale `name`.
+
+    `abday` and `day` are indexed by `datetime.weekday()`, `abmon` and `mon` by `month - 1`.
+    `am_pm` holds the strings for `%p` and the `*_fmt` attributes are strftime patterns, or `None`
+    if they could not be determined.
+    """
+
+    def __init__(self, name, abday, day, abmon, mon, am_pm,
+                 d_t_fmt, d_fmt, t_fmt, t_fmt_ampm=None):
+        self.name = name
+        self.abday = abday
+        self.day = day
+        self.abmon = abmon
+        self.mon = mon
+        self.am_pm = am_pm
+        self.d_t_fmt = d_t_fmt
+        self.d_fmt = d_fmt
+        self.t_fmt = t_fmt
+        self.t_fmt_ampm = t_fmt_ampm
+
+        self.emitters = {
+            'a': lambda dt: abday[dt.weekday()],
+            'A': lambda dt: day[dt.weekday()],
+            'b': lambda dt: abmon[dt.month - 1],
+            'h': lambda dt: abmon[dt.month - 1],
+            'B': lambda dt: mon[dt.month - 1],
+            'p': lambda dt: am_pm[dt.hour >= 12],
+        }
+
+    def expand(self, format):
+        """Replaces `%c`, `%x`, `%X` and `%r` in `format` with the locale's patterns.
+
+        `%Ec`, `%Ex` and `%EX` are replaced with the regular patterns as well.
+        """
+        def replace(m):
+            attr = _PATTERN_FIELDS.get(m.group()[-1])
+            pattern = getattr(self, attr) if attr else None
+            return pattern if pattern is not None else m.group()
+        return _pattern_re.sub(replace, format)
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, self.name)
+
+
+def _decode(text, encoding):
+    if ST2 and isinstance(text, str):
+        try:
+            return text.decode(encoding)
+        except UnicodeDecodeError:
+            return text.decode('utf-8')
+    return text
+
+
+# Monday, 1 January 2018; covers each weekday within a week
+_WEEK_START = datetime(2018, 1, 1)
+# A datetime with distinct values in every field, used to recover patterns from strftime output
+_SAMPLE = datetime(2033, 11, 22, 13, 44, 55)
+
+
+def _derive_pattern(spec, names):
+    """Recovers the pattern behind `spec` (like `%c`) from its output for `_SAMPLE`."""
+    sample = _SAMPLE
+    tokens = [
+        (names['day'][sample.weekday()], '%A'),
+        (names['abday'][sample.weekday()], '%a'),
+        (names['mon'][sample.month - 1], '%B'),
+        (names['abmon'][sample.month - 1], '%b'),
+        ("2033", '%Y'), ("33", '%y'), ("11", '%m'), ("22", '%d'),
+        ("13", '%H'), ("01", '%I'), ("44", '%M'), ("55", '%S'),
+    ]
+    if names['am_pm'][1]:
+        tokens.append((names['am_pm'][1], '%p'))
+    tokens = [(text, field) for text, field in tokens if text]
+    # Prefer longer matches, e.g. "2033" over "33"
+    tokens.sort(key=lambda token: -len(token[0]))
+    fields = dict(tokens)
+    regex = re.compile('|'.join(re.escape(text) for text, _ in tokens))
+
+    text = sample.strftime(spec)
+    parts = []
+    pos = 0
+    for m in regex.finditer(text):
+        parts.append(text[pos:m.start()].replace('%', '%%'))
+        parts.append(fields[m.group()])
+        pos = m.end()
+    parts.append(text[pos:].replace('%', '%%'))
+    return ''.join(parts)
+
+
+def _read_table(name):
+    # Must be called with LC_TIME set to the locale `name`
+    encoding = locale.getlocale(locale.LC_TIME)[1] or 'utf-8'
+
+    if hasattr(locale, 'nl_langinfo'):
+        def info(*items):
+            return [_decode(locale.nl_langinfo(getattr(locale, item)), encoding)
+                    for item in items]
+        # nl_langinfo starts the week on Sunday
+        abday = info(*('ABDAY_%d' % (i % 7 + 1) for i in range(1, 8)))
+        day = info(*('DAY_%d' % (i % 7 + 1) for i in range(1, 8)))
+        abmon = info(*('ABMON_%d' % i for i in range(1, 13)))
+        mon = info(*('MON_%d' % i for i in range(1, 13)))
+        am_pm = info('AM_STR', 'PM_STR')
+        d_t_fmt, d_fmt, t_fmt, t_fmt_ampm = info('D_T_FMT', 'D_FMT', 'T_FMT', 'T_FMT_AMPM')
+        # Locales without a 12-hour clock have an empty pattern
+        return LocaleTable(name, abday, day, abmon, mon, am_pm,
+                           d_t_fmt, d_fmt, t_fmt, t_fmt_ampm or None)
+
+    # Windows has no nl_langinfo, so render known dates instead
+    def render(spec, dates):
+        return [_decode(dt.strftime(spec), encoding) for dt in dates]
+
+    week = [_WEEK_START + timedelta(days=i) for i in range(7)]
+    year = [datetime(2018, i, 1) for i in range(1, 13)]
+    names = dict(
+        abday=render('%a', week),
+        day=render('%A', week),
+        abmon=render('%b', year),
+        mon=render('%B', year),
+        am_pm=render('%p', [datetime(2018, 1, 1, 1), datetime(2018, 1, 1, 13)]),
+    )
+    patterns = [_derive_pattern(spec, names) for spec in ('%c', '%x', '%X')]
+    return LocaleTable(name, *([names[key] for key in ('abday', 'day', 'abmon', 'mon', 'am_pm')]
+                               + patterns))
+
+
+def load_locale(name):
+    """Returns the LocaleTable for the locale `name` (like "de_DE.UTF-8").
+
+    Tables are loaded on first use and kept in a bounded cache. Raises UnknownLocaleError if the
+    locale is not available.
+    """
+    with setlocale_lock:
+        table = _cache.get(name)
+        if table is not None:
+            return table
+
+        previous = locale.setlocale(locale.LC_TIME)
+        try:
+            try:
+                locale.setlocale(locale.LC_TIME, str(name))  # convert to ansi for ST2
+            except locale.Error:
+                raise UnknownLocaleError("Locale %r is not available" % name)
+            table = _read_table(name)
+        finally:
+            locale.setlocale(locale.LC_TIME, previous)
+
+        _cache.put(name, table)
+    return table
+
+
+def clear_cache():
+    with setlocale_lock:
+        _cache.clear()
@@ -0,0 +1,58 @@
+"""Runs work on contiguous chunks of a sequence in a shared thread pool.
+
+Falls back to running in the calling thread where `concurrent.futures` is not available (Python 2,
+as used by ST2). The functions passed in must not share mutable state between chunks.
+`concurrent.futures` is only imported once a pool is needed, since it adds noticeably to the time
+it takes to load the plugin.
+"""
+
+import threading
+
+
+# Sequences shorter than this (per worker) are not worth splitting
+MIN_CHUNK_SIZE = 16
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(workers):
+    """Returns the shared executor with `workers` threads, or `None` if threads are unavailable."""
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+    except ImportError:
+        return None
+    with _executors_lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = _executors[workers] = ThreadPoolExecutor(workers)
+        return executor
+
+
+def split(items, parts):
+    """Splits the sequence `items` into at most `parts` contiguous slices of about equal size."""
+    size = -(-len(items) // parts)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def map_chunks(func, items, workers, min_chunk_size=MIN_CHUNK_SIZE):
+    """Returns `[func(chunk) for chunk in chunks]` for contiguous chunks of the sequence `items`.
+
+    The chunks are processed by up to `workers` threads and the results are in the order of
+    `items`. Short sequences, `workers` below 2 and missing thread support run `func` on all of
+    `items` in the calling thread instead.
+    """
+    parts = min(workers or 1, len(items) // min_chunk_size)
+    executor = get_executor(workers) if parts > 1 else None
+    if executor is None:
+        return [func(items)]
+    return list(executor.map(func, split(items, parts)))
+
+
+def shutdown():
+    """Stops the threads of all shared executors."""
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=False)
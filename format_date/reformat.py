@@ -0,0 +1,177 @@
+"""Finds timestamps in text and renders them with another format and/or timezone."""
+
+from datetime import datetime, timedelta
+import re
+
+from .backends import convert, localize
+
+
+# Input formats that can be recognized. Patterns must not match across line breaks.
+INPUT_PATTERNS = {
+    # 2024-01-05T13:00:00.123+01:00, 2024-01-05 13:00, 2024-01-05T12:00:00Z
+    'iso': r'''(?P<iso>(?<!\d)
+        (?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2})
+        [T\x20](?P<hour>\d{2}):(?P<minute>\d{2})
+        (?::(?P<second>\d{2})(?:[.,](?P<fraction>\d{1,6})\d*)?)?
+        (?P<tz>Z|[+-]\d{2}:?\d{2})?
+    )''',
+    # 10-digit epoch seconds, optionally with a fraction: 1704459600, 1704459600.25
+    'unix': r'(?P<unix>(?<![\d.])\d{10}(?:\.\d+)?(?![\d.]))',
+    # 13-digit epoch milliseconds: 1704459600000
+    'unix_ms': r'(?P<unix_ms>(?<![\d.])\d{13}(?![\d.]))',
+}
+DEFAULT_INPUTS = ('iso', 'unix')
+
+# Longest text any pattern can match; used to find safe chunk boundaries
+MAX_MATCH = 64
+CHUNK_SIZE = 1 << 20
+
+# Characters that may end a timestamp or affect the look-behinds of the patterns;
+# chunks are not split after these
+_BEFORE_CUT = frozenset("0123456789.Z")
+
+_EPOCH = datetime(1970, 1, 1)
+_pattern_cache = {}
+
+
+def compile_inputs(inputs=DEFAULT_INPUTS):
+    """Returns a compiled regular expression matching any of the named input formats."""
+    key = tuple(inputs)
+    pattern = _pattern_cache.get(key)
+    if pattern is None:
+        try:
+            parts = [INPUT_PATTERNS[name] for name in key]
+        except KeyError as e:
+            raise ValueError("Unknown input format %s; expected one of %s"
+                             % (e, ", ".join(sorted(INPUT_PATTERNS))))
+        pattern = re.compile('|'.join(parts), re.VERBOSE)
+        _pattern_cache[key] = pattern
+    return pattern
+
+
+def _split_chunk(chunk, pattern):
+    """Returns the position up to which `chunk` can be scanned without cutting off a timestamp."""
+    cut = chunk.rfind('\n') + 1
+    if cut:
+        return cut
+
+    # Exceptionally long line: find a position that no timestamp (including the look-arounds of
+    # the patterns) can extend across, ignoring the last MAX_MATCH characters
+    limit = max(0, len(chunk) - MAX_MATCH)
+    cut = limit
+    while cut > 0 and chunk[cut - 1] in _BEFORE_CUT:
+        cut -= 1
+    for m in pattern.finditer(chunk, max(0, cut - MAX_MATCH)):
+        if m.start() < cut < m.end():
+            cut = m.start()
+            break
+    return cut or limit or len(chunk)
+
+
+class Reformatter(object):
+    """Re-renders timestamps found in text using a FormatDate instance.
+
+    Naive timestamps are interpreted in `tz_in` (the FormatDate's default if `None`). All
+    timestamps are converted to `tz_out`; if that is `None`, epoch timestamps are converted to
+    `tz_in` and ISO timestamps with an offset keep it.
+
+    Matches that are not valid timestamps, like "2024-02-30 10:00", are left unchanged and
+    counted in `skipped`.
+    """
+
+    def __init__(self, fdate, format=None, tz_in=None, tz_out=None, inputs=DEFAULT_INPUTS):
+        from . import load_pytz
+
+        self.fdate = fdate
+        pytz = load_pytz()
+        self._utc = pytz.utc
+        self._fixed_offset = pytz.FixedOffset
+
+        if tz_in is None:
+            tz_in = fdate.default['tz_in']
+        if tz_in == "local":
+            tz_in = fdate.local_tz
+        self.tz_in = fdate.check_tzparam(tz_in, 'tz_in')
+        self.tz_out = fdate.check_tzparam(tz_out, 'tz_out')
+
+        self.format = format if format is not None else fdate.default['format']
+        self.pattern = compile_inputs(inputs)
+        self.skipped = 0
+
+    def parse_match(self, m):
+        """Returns an aware datetime object for a match of `self.pattern`."""
+        groups = m.groupdict()
+        if groups.get('iso'):
+            fraction = groups['fraction'] or '0'
+            dt = datetime(int(groups['year']), int(groups['month']), int(groups['day']),
+                          int(groups['hour']), int(groups['minute']), int(groups['second'] or 0),
+                          int(fraction.ljust(6, '0')))
+            tz = groups['tz']
+            if not tz:
+                return self._localize(dt, self.tz_in)
+            if tz == 'Z':
+                return dt.replace(tzinfo=self._utc)
+            minutes = int(tz[1:3]) * 60 + int(tz[-2:])
+            return dt.replace(tzinfo=self._fixed_offset(-minutes if tz[0] == '-' else minutes))
+
+        if groups.get('unix_ms'):
+            delta = timedelta(milliseconds=int(groups['unix_ms']))
+        else:
+            delta = timedelta(seconds=float(groups['unix']))
+        dt = (_EPOCH + delta).replace(tzinfo=self._utc)
+        return dt.astimezone(self.tz_in)
+
+    @staticmethod
+    def _localize(dt, tz):
+        localized = localize(dt, tz)
+        if localized is None:
+            # Fallback for other timezones ('local')
+            return dt.replace(tzinfo=tz)
+        return localized
+
+    def convert(self, dt):
+        if self.tz_out is None:
+            return dt
+        return convert(dt, self.tz_out)
+
+    def try_render(self, m):
+        """Returns the re-rendered text of a match or `None` if it is not a valid timestamp."""
+        try:
+            dt = self.convert(self.parse_match(m))
+        except (ValueError, OverflowError):
+            # Out of range, like "2024-02-30 10:00" or "0000-00-00 00:00"
+            self.skipped += 1
+            return None
+        return self.fdate.parse_datetime(dt, self.format)
+
+    def render_match(self, m):
+        text = self.try_render(m)
+        return m.group(0) if text is None else text
+
+    def reformat_text(self, text):
+        """Returns `text` with all recognized timestamps re-rendered."""
+        return self.pattern.sub(self.render_match, text)
+
+    def iter_replacements(self, read, start, end, chunk_size=CHUNK_SIZE):
+        """Yields `(begin, end, text)` for every timestamp between `start` and `end`.
+
+        `read(a, b)` must return the text between the positions `a` and `b`. The text is read in
+        chunks of about `chunk_size` characters, and each chunk is only read after all
+        replacements of the previous chunks have been yielded. This allows applying the
+        replacements while iterating, as long as `read` accounts for the resulting shift.
+        Invalid timestamps are skipped.
+        """
+        # Leave enough room to find a position to split chunks at
+        chunk_size = max(chunk_size, 16 * MAX_MATCH)
+        pos = start
+        while pos < end:
+            chunk_end = min(end, pos + chunk_size)
+            chunk = read(pos, chunk_end)
+            if not chunk:
+                break
+            cut = len(chunk) if chunk_end == end else _split_chunk(chunk, self.pattern)
+            for m in self.pattern.finditer(chunk, 0, cut):
+                text = self.try_render(m)
+                if text is not None:
+                    yield pos + m.start(), pos + m.end(), text
+            pos += cut
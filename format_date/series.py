@@ -0,0 +1,149 @@
+"""Generates series of dates at fixed steps, like every day or every 15 minutes.
+
+Steps are written as an optional sign, a number and a unit: "+1d", "15m", "-1w". Steps in seconds,
+minutes and hours advance the absolute time, while steps in days and weeks keep the wall time
+across changes of the UTC offset, so that a daily series stays at midnight.
+"""
+
+import calendar
+from datetime import datetime, timedelta
+import re
+
+from .backends import localize
+
+
+STEP_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+# Units whose steps keep the wall time
+WALL_UNITS = frozenset('dw')
+
+# Interval in seconds at which the UTC offsets of a series of wall times are looked up; offsets
+# are assumed not to change more than once within it
+PROBE_INTERVAL = 7 * 86400
+
+_DAY = timedelta(days=1)
+
+_step_re = re.compile(r'^\s*([+-]?)\s*(\d+)\s*([smhdw])\s*$')
+# 2024-01-05, 2024-01-05 13:00, 2024-01-05T13:00:30
+_start_re = re.compile(r'^\s*(\d{4})-(\d{2})-(\d{2})'
+                       r'(?:[T ](\d{2}):(\d{2})(?::(\d{2}))?)?\s*$')
+
+
+def parse_step(step):
+    """Returns `(seconds, wall)` for a step like "+1d"; raises ValueError for invalid steps."""
+    m = _step_re.match(step)
+    if not m:
+        raise ValueError("Invalid step %r; expected e.g. '+1d', '15m' or '-1w' (units: %s)"
+                         % (step, ", ".join(sorted(STEP_UNITS))))
+    sign, amount, unit = m.groups()
+    seconds = int(amount) * STEP_UNITS[unit]
+    if sign == '-':
+        seconds = -seconds
+    return seconds, unit in WALL_UNITS
+
+
+def parse_start(start):
+    """Returns the naive datetime of an ISO date like "2024-01-05" or "2024-01-05 13:00"."""
+    m = _start_re.match(start)
+    if not m:
+        raise ValueError("Invalid start %r; expected e.g. '2024-01-05' or '2024-01-05 13:00'"
+                         % start)
+    return datetime(*[int(part or 0) for part in m.groups()])
+
+
+def localize_wall(dt, tz):
+    """Attaches `tz` to the naive wall time `dt`, also for tzinfo objects without `localize`.
+
+    For those (like 'local'), ambiguous wall times resolve to the time without DST and
+    non-existent ones to the time after the transition, as pytz's zones do once normalized.
+    """
+    localized = localize(dt, tz)
+    if localized is None:
+        # Fallback for other timezones ('local')
+        return _localize_fromutc(dt, tz)
+    return localized
+
+
+def _localize_fromutc(dt, tz):
+    # The offsets before and after a change around `dt`; changes are more than a day apart
+    offsets = []
+    for delta in (-_DAY, _DAY):
+        offset = tz.fromutc((dt + delta).replace(tzinfo=tz)).utcoffset()
+        if offset not in offsets:
+            offsets.append(offset)
+
+    matches = []
+    for offset in offsets:
+        local = tz.fromutc((dt - offset).replace(tzinfo=tz))
+        if local.replace(tzinfo=None) == dt:
+            matches.append(local)
+    if matches:
+        # Prefer the time without DST if it is ambiguous
+        return min(matches, key=lambda local: bool(local.dst()))
+    # Non-existent: apply the offset from before the change, which moves it forward
+    return tz.fromutc((dt - offsets[0]).replace(tzinfo=tz))
+
+
+def timestamp(dt):
+    """Returns the seconds since the epoch of the aware datetime `dt`."""
+    return calendar.timegm(dt.utctimetuple()) + dt.microsecond / 1e6
+
+
+def epochs(start, seconds, count):
+    """Returns the `count` timestamps from `start` on, `seconds` apart."""
+    return [start + i * seconds for i in range(count)]
+
+
+def wall_datetimes(start, seconds, count, tz):
+    """Returns the aware datetimes of `count` wall times in `tz` that are `seconds` apart from
+    `start`.
+
+    The UTC offsets only change a few times a year, so instead of localizing every item, they are
+    looked up every `PROBE_INTERVAL` seconds and bisected where they differ. Items between
+    changes reuse the tzinfo of their neighbours; only those next to a change are converted from
+    their timestamp, which also moves non-existent wall times past the transition.
+    """
+    delta = timedelta(seconds=seconds)
+    # (offset, name, tzinfo) of every item
+    states = [None] * count
+
+    def state(i):
+        dt = localize_wall(start + i * delta, tz)
+        return dt.utcoffset(), dt.tzname(), dt.tzinfo
+
+    def fill(lo, hi, lo_state, hi_state):
+        # Sets the states of items lo..hi, given those of the two ends
+        while lo_state != hi_state and hi - lo > 1:
+            mid = (lo + hi) // 2
+            mid_state = state(mid)
+            fill(lo, mid, lo_state, mid_state)
+            lo, lo_state = mid, mid_state
+        if lo_state == hi_state:
+            states[lo:hi + 1] = [lo_state] * (hi + 1 - lo)
+        else:
+            states[lo], states[hi] = lo_state, hi_state
+
+    if not count:
+        return []
+    probe = max(1, PROBE_INTERVAL // abs(seconds or 1))
+    lo, lo_state = 0, state(0)
+    states[0] = lo_state
+    while lo < count - 1:
+        hi = min(lo + probe, count - 1)
+        hi_state = state(hi)
+        fill(lo, hi, lo_state, hi_state)
+        lo, lo_state = hi, hi_state
+
+    # Items next to a change of the offset may be ambiguous or non-existent
+    exact = set([0, count - 1])
+    for i in range(1, count):
+        if states[i] != states[i - 1]:
+            exact.update((i - 1, i))
+
+    dts = []
+    for i in range(count):
+        wall = start + i * delta
+        if i in exact:
+            dts.append(datetime.fromtimestamp(timestamp(localize_wall(wall, tz)), tz))
+        else:
+            dts.append(wall.replace(tzinfo=states[i][2]))
+    return dts
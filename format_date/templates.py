@@ -0,0 +1,107 @@
+"""Templates that combine several formats, like `${%Y-%m-%d} (UTC ${%H:%M|tz_out=UTC})`.
+
+Each `${...}` field holds a format, optionally followed by `|key=value` parameters for `tz_in`,
+`tz_out` and `locale`. Text outside of fields is copied as is; `$$` stands for a single `$`.
+"""
+
+import re
+
+from .cache import LRUCache
+from .compiler import format_resolution
+
+
+# Size of the template cache, keyed by template string
+CACHE_SIZE = 64
+PARAMETERS = ('tz_in', 'tz_out', 'locale')
+
+_cache = LRUCache(CACHE_SIZE)
+_token_re = re.compile(r'\$\$|\$\{([^}]*)\}|\$\{|%')
+
+
+def is_template(format):
+    return format is not None and '${' in format
+
+
+class Template(object):
+    """A compiled template.
+
+    `fields` is a list of `(format, params)` tuples, where `format` may be `None` for the default
+    format and `params` is a dict with any of the keys in `PARAMETERS`.
+    """
+
+    def __init__(self, text, chunks, fields):
+        self.text = text
+        self.fields = fields
+        self._template = ''.join(chunks)
+
+    def join(self, values):
+        """Returns the template with the rendered `values` of all fields inserted."""
+        return self._template % tuple(values)
+
+    def resolution(self, default_format, locale=None):
+        """Returns the interval in seconds after which the output may change (0, 1 or `None`).
+
+        Fields may use different timezones, so anything but sub-second fields counts as seconds.
+        """
+        resolution = None
+        for format, params in self.fields:
+            if format is None:
+                format = default_format
+            r = format_resolution(format, params.get('locale', locale))
+            if r is not None and (resolution is None or r < resolution):
+                resolution = r
+        if resolution is None:
+            return None
+        return min(resolution, 1)
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, self.text)
+
+
+def _parse_field(content):
+    parts = content.split('|')
+    format = parts[0] or None
+    params = {}
+    for part in parts[1:]:
+        key, sep, value = part.partition('=')
+        key = key.strip()
+        if not sep or key not in PARAMETERS:
+            raise ValueError("Invalid template parameter %r; expected one of %s"
+                             % (part, ", ".join("%s=..." % p for p in PARAMETERS)))
+        params[key] = value.strip()
+    return format, params
+
+
+def compile_template(text):
+    """Compiles the template `text`. Results are kept in a bounded LRU cache."""
+    template = _cache.get(text)
+    if template is not None:
+        return template
+
+    chunks = []
+    fields = []
+    pos = 0
+    for m in _token_re.finditer(text):
+        chunks.append(text[pos:m.start()])
+        token = m.group()
+        if token == '$$':
+            chunks.append('$')
+        elif token == '%':
+            chunks.append('%%')
+        elif token == '${':
+            raise ValueError("Unclosed field in template %r" % text)
+        else:
+            if is_template(m.group(1)):
+                raise ValueError("Fields can not be nested in template %r" % text)
+            fields.append(_parse_field(m.group(1)))
+            chunks.append('%s')
+        pos = m.end()
+    chunks.append(text[pos:])
+
+    template = Template(text, chunks, fields)
+    _cache.put(text, template)
+    return template
+
+
+def clear_cache():
+    _cache.clear()
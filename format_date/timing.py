@@ -0,0 +1,127 @@
+"""Helpers for measuring how long things take."""
+
+import math
+import time
+
+
+# Highest resolution clock available (Python 3.3+)
+clock = getattr(time, 'perf_counter', time.time)
+
+# (stage, seconds) tuples of the deferred loading steps that have run so far
+load_times = []
+
+
+class StageTimer(object):
+    """Records the durations of consecutive stages.
+
+    Call `mark(name)` at the end of each stage. The first stage starts when the timer is created.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self._last = clock()
+
+    def add(self, name, duration):
+        """Adds a stage that was measured elsewhere."""
+        self.stages.append((name, duration))
+
+    def mark(self, name):
+        now = clock()
+        self.stages.append((name, now - self._last))
+        self._last = now
+
+    def total(self):
+        return sum(duration for _, duration in self.stages)
+
+    def report(self, budget=None):
+        """Returns the recorded stages as a multi-line string.
+
+        If `budget` (in seconds) is given, the last line states whether the total exceeded it.
+        """
+        lines = ["%-30s %8.2f ms" % (name, duration * 1000) for name, duration in self.stages]
+        total = self.total()
+        lines.append("%-30s %8.2f ms" % ("total", total * 1000))
+        if budget is not None:
+            lines.append("%s budget of %.2f ms"
+                         % ("EXCEEDED" if total > budget else "within", budget * 1000))
+        return "\n".join(lines)
+
+
+class Histogram(object):
+    """Counts durations in a fixed number of exponentially growing buckets.
+
+    Bucket 0 holds durations below `BASE` seconds, bucket `i` those below `BASE * 2 ** i` and the
+    last bucket everything else.
+    """
+
+    BASE = 1e-6
+    SIZE = 24
+
+    def __init__(self):
+        self.buckets = [0] * self.SIZE
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        if seconds < self.BASE:
+            i = 0
+        else:
+            i = min(self.SIZE - 1, int(math.log(seconds / self.BASE, 2)) + 1)
+        self.buckets[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        """Returns the upper bound of the bucket containing the given percentile."""
+        target = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return min(self.BASE * 2 ** i, self.max)
+        return self.max
+
+
+class Instrumentation(object):
+    """Collects durations of the stages of `FormatDate.parse`, keyed by format or zone.
+
+    At most `MAX_KEYS` keys are tracked per stage; durations for further keys are collected under
+    "(other)".
+    """
+
+    MAX_KEYS = 64
+
+    def __init__(self):
+        self.stats = {}
+
+    def record(self, stage, key, seconds):
+        keys = self.stats.setdefault(stage, {})
+        histogram = keys.get(key)
+        if histogram is None:
+            if len(keys) >= self.MAX_KEYS:
+                key = "(other)"
+            histogram = keys.setdefault(key, Histogram())
+        histogram.add(seconds)
+
+    def clear(self):
+        self.stats.clear()
+
+    def report(self):
+        """Returns the collected statistics as a multi-line string."""
+        lines = ["%-10s %-30s %8s %10s %10s %10s %10s"
+                 % ("stage", "key", "count", "mean us", "p50 us", "p99 us", "max us")]
+        for stage in sorted(self.stats):
+            keys = self.stats[stage]
+            for key in sorted(keys, key=lambda k: -keys[k].total):
+                h = keys[key]
+                lines.append("%-10s %-30s %8d %10.1f %10.1f %10.1f %10.1f"
+                             % (stage, key[:30], h.count, h.mean() * 1e6,
+                                h.percentile(0.5) * 1e6, h.percentile(0.99) * 1e6,
+                                h.max * 1e6))
+        return "\n".join(lines)
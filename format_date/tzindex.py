@@ -0,0 +1,183 @@
+"""An index over pytz's timezones for quick lookups by name, abbreviation, offset or city."""
+
+from bisect import bisect_right
+from datetime import datetime, timedelta
+import re
+
+
+_offset_re = re.compile(r'^(?:UTC|GMT)?\s*([+-])\s*(\d{1,2})(?::?(\d{2}))?$', re.IGNORECASE)
+
+
+def parse_offset(query):
+    """Returns the offset in minutes described by strings like `+2`, `UTC-05:00` or `+0530`.
+
+    Returns `None` if `query` does not look like an offset.
+    """
+    query = query.strip()
+    if query.upper() in ('UTC', 'GMT'):
+        return 0
+    m = _offset_re.match(query)
+    if not m:
+        return None
+    sign, hours, minutes = m.groups()
+    offset = int(hours) * 60 + int(minutes or 0)
+    return -offset if sign == '-' else offset
+
+
+def format_offset(minutes):
+    sign = '-' if minutes < 0 else '+'
+    return "UTC%s%02d:%02d" % (sign, abs(minutes) // 60, abs(minutes) % 60)
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _minutes(offset):
+    return offset.days * 1440 + offset.seconds // 60
+
+
+def _add(mapping, key, name):
+    names = mapping.setdefault(key, [])
+    if name not in names:
+        names.append(name)
+
+
+class TimezoneIndex(object):
+    """Lookup tables for all timezones known to pytz.
+
+    * `names` is the list of all timezone names, in the order of `pytz.all_timezones`
+    * `positions` maps each name to its position in `names`
+    * `abbreviations` maps abbreviations like `CET` to the zones that use them
+    * `offsets` maps UTC offsets in minutes to the zones that use them
+
+    Abbreviations and offsets are those in use in January and July of `year`, i.e. both standard
+    and daylight saving time. Since they require loading every zone, they are only collected on
+    first access. `aliases` maps lower-case city names (like "new york") of the common timezones
+    to their full names.
+
+    `describe` annotates zones with their current abbreviation, offset and local time. The state of
+    each zone is read from pytz's transition data and kept until the zone's next transition.
+    """
+
+    def __init__(self, pytz, year):
+        self.version = pytz.OLSON_VERSION
+        self.year = year
+        self.names = list(pytz.all_timezones)
+        self.positions = dict((name, i) for i, name in enumerate(self.names))
+        self.aliases = {}
+        for name in pytz.common_timezones:
+            city = name.rsplit('/', 1)[-1].replace('_', ' ').lower()
+            _add(self.aliases, city, name)
+
+        self._pytz = pytz
+        self._abbreviations = None
+        self._offsets = None
+        # name -> (offset in minutes, abbreviation, start, end); start and end are naive UTC
+        # datetimes of the surrounding transitions or `None`
+        self._states = {}
+
+    @property
+    def abbreviations(self):
+        if self._abbreviations is None:
+            self._collect()
+        return self._abbreviations
+
+    @property
+    def offsets(self):
+        if self._offsets is None:
+            self._collect()
+        return self._offsets
+
+    def _collect(self):
+        abbreviations = {}
+        offsets = {}
+        samples = (datetime(self.year, 1, 1), datetime(self.year, 7, 1))
+        for name in self.names:
+            tz = self._pytz.timezone(name)
+            for sample in samples:
+                dt = tz.localize(sample)
+                offset = dt.utcoffset()
+                _add(offsets, _minutes(offset), name)
+                abbr = dt.tzname()
+                # Skip numeric pseudo-abbreviations like "+03"
+                if abbr and abbr[0].isalpha():
+                    _add(abbreviations, abbr.upper(), name)
+        self._abbreviations = abbreviations
+        self._offsets = offsets
+
+    def state(self, name, now):
+        """Returns the UTC offset in minutes and the abbreviation of zone `name` at `now`.
+
+        `now` is a naive datetime in UTC.
+        """
+        cached = self._states.get(name)
+        if (cached is not None
+                and (cached[2] is None or cached[2] <= now)
+                and (cached[3] is None or now < cached[3])):
+            return cached[:2]
+
+        tz = self._pytz.timezone(name)
+        transitions = getattr(tz, '_utc_transition_times', None)
+        if transitions:
+            # Same lookup as pytz's `fromutc`, without building a datetime
+            i = max(0, bisect_right(transitions, now) - 1)
+            offset, _, abbr = tz._transition_info[i]
+            start = transitions[i] if i else None
+            end = transitions[i + 1] if i + 1 < len(transitions) else None
+        else:
+            # Zones with a single offset
+            offset = tz.utcoffset(now)
+            abbr = tz.tzname(now)
+            start = end = None
+
+        cached = self._states[name] = (_minutes(offset), abbr, start, end)
+        return cached[:2]
+
+    def describe(self, names, now):
+        """Returns a string like "CEST, UTC+02:00, 14:05" for each zone in `names`.
+
+        `now` is a unix timestamp.
+        """
+        now = _EPOCH + timedelta(seconds=int(now))
+        # Minutes since midnight, UTC
+        minute = now.hour * 60 + now.minute
+        rows = []
+        for name in names:
+            offset, abbr = self.state(name, now)
+            local = (minute + offset) % 1440
+            rows.append("%s, %s, %02d:%02d"
+                        % (abbr, format_offset(offset), local // 60, local % 60))
+        return rows
+
+    def position(self, name, default=0):
+        """Returns the position of `name` in `names`, or `default` if it is unknown."""
+        return self.positions.get(name, default)
+
+    def search(self, query):
+        """Returns the names of all zones matching `query`.
+
+        `query` may be a UTC offset (`+2`, `UTC-05:00`, `+0530`), an abbreviation (`EST`),
+        a city name (`new york`) or part of a zone name.
+        """
+        query = query.strip()
+        if not query:
+            return list(self.names)
+
+        offset = parse_offset(query)
+        if offset is not None:
+            return list(self.offsets.get(offset, ()))
+
+        results = []
+        seen = set()
+        for names in (self.abbreviations.get(query.upper(), ()),
+                      self.aliases.get(query.lower(), ())):
+            for name in names:
+                if name not in seen:
+                    seen.add(name)
+                    results.append(name)
+
+        lowered = query.lower().replace(' ', '_')
+        for name in self.names:
+            if name not in seen and lowered in name.lower():
+                results.append(name)
+        return results
@@ -0,0 +1,383 @@
+"""A precompiled table of all timezones in one binary file that is read through `mmap`.
+
+Build it with `python -m format_date.zonetable` (from pytz's tz database). Loading a zone from the
+table only creates a few objects for its offsets; the transition times stay in the mapped file and
+are binary-searched in place, so memory usage does not grow with the number of zones in use.
+Zones with identical data (links like "US/Eastern") share it in the file.
+
+Layout (little-endian):
+
+- Header: magic `FDZT`, format version (uint16), padding (uint16), number of zones, offset of the
+  zone index, offset of the string table and offset of the tz database version in the string
+  table (uint32 each).
+- Zone index: per zone the offsets of its name (in the string table), its data and its types,
+  the number of transitions and the number of types (uint32 each), sorted by name.
+- Zone data: the UTC transition times in seconds since the epoch (int64, 8-byte aligned)
+  followed by the index of the type that starts at each of them (uint8).
+- Types: UTC offset and DST offset in seconds (int32) and the offset of the abbreviation in the
+  string table (uint32).
+- String table: each string is stored as its UTF-8 length (uint8) and bytes.
+"""
+
+import argparse
+from array import array
+from bisect import bisect_right
+from datetime import timedelta, tzinfo
+import mmap
+import os
+import struct
+import sys
+
+
+MAGIC = b'FDZT'
+FORMAT_VERSION = 1
+
+def default_path():
+    """Returns the path the zone table is built at and loaded from unless told otherwise.
+
+    `FORMAT_DATE_ZONE_TABLE` overrides it. The table lives in the user's cache directory, since the
+    package's directory may be read-only or a `.sublime-package` archive.
+    """
+    path = os.environ.get('FORMAT_DATE_ZONE_TABLE')
+    if path:
+        return path
+    if sys.platform == 'win32':
+        directory = os.environ.get('LOCALAPPDATA') or os.path.expanduser("~")
+    elif sys.platform == 'darwin':
+        directory = os.path.expanduser("~/Library/Caches")
+    else:
+        directory = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser("~/.cache")
+    return os.path.join(directory, "format_date", "zones.bin")
+
+
+_HEADER = struct.Struct('<4sHHIIII')
+_INDEX = struct.Struct('<IIIII')
+_TYPE = struct.Struct('<iiI')
+
+# datetime(1970, 1, 1).toordinal()
+_EPOCH_ORDINAL = 719163
+# Stands in for the start of time in zones without transitions
+_BIG_BANG = -(1 << 62)
+_SIX_HOURS = timedelta(hours=6)
+
+# `memoryview.cast` is only available (and correct) on Python 3 and little-endian machines
+_CAST = hasattr(memoryview, 'cast') and sys.byteorder == 'little'
+
+
+def _stamp(dt):
+    """Returns the seconds since the epoch of the (wall) time of `dt`, ignoring its tzinfo."""
+    return ((dt.toordinal() - _EPOCH_ORDINAL) * 86400
+            + dt.hour * 3600 + dt.minute * 60 + dt.second)
+
+
+def _seconds(delta):
+    return delta.days * 86400 + delta.seconds
+
+
+class ZoneOffset(tzinfo):
+    """The fixed offset of a TableZone for one period, like pytz's tzinfo instances."""
+
+    def __init__(self, zone, utcoffset, dst, tzname):
+        self._zone = zone
+        self.zone = zone.zone
+        self._seconds = utcoffset
+        self._utcoffset = timedelta(seconds=utcoffset)
+        self._dst = timedelta(seconds=dst)
+        self._tzname = tzname
+
+    def utcoffset(self, dt):
+        return self._utcoffset
+
+    def dst(self, dt):
+        return self._dst
+
+    def tzname(self, dt):
+        return self._tzname
+
+    def localize(self, dt, is_dst=False):
+        return self._zone.localize(dt, is_dst)
+
+    def normalize(self, dt):
+        return self._zone.normalize(dt)
+
+    def __repr__(self):
+        return "<%s %r %s>" % (type(self).__name__, self.zone, self._tzname)
+
+
+class TableZone(tzinfo):
+    """A timezone of a ZoneTable with pytz's `localize` and `normalize` methods.
+
+    Aware datetimes carry one of the zone's ZoneOffset instances, like with pytz. Used as tzinfo
+    directly, wall times are resolved like `localize` does.
+    """
+
+    def __init__(self, name, transitions, type_indexes, load_type, type_count):
+        self.zone = name
+        self._transitions = transitions
+        self._type_indexes = type_indexes
+        # `load_type(i)` returns the `(utcoffset, dst, tzname)` of type `i`
+        self._load_type = load_type
+        # Created on first use, most zones only ever need one or two
+        self._offsets = [None] * type_count
+
+    def _offset(self, i):
+        offset = self._offsets[i]
+        if offset is None:
+            offset = self._offsets[i] = ZoneOffset(self, *self._load_type(i))
+        return offset
+
+    def _offset_at(self, stamp):
+        # The offset in effect at the UTC time `stamp`
+        i = bisect_right(self._transitions, stamp) - 1
+        return self._offset(self._type_indexes[i if i > 0 else 0])
+
+    def fromutc(self, dt):
+        offset = self._offset_at(_stamp(dt))
+        return (dt + offset._utcoffset).replace(tzinfo=offset)
+
+    def localize(self, dt, is_dst=False):
+        """Attaches the zone's offset for the naive wall time `dt`, like pytz does.
+
+        Ambiguous and non-existent times are resolved with `is_dst`; `None` raises ValueError
+        for them instead.
+        """
+        if dt.tzinfo is not None:
+            raise ValueError("Not naive datetime (tzinfo is already set)")
+
+        wall = _stamp(dt)
+        i = bisect_right(self._transitions, wall)
+        possible = []
+        for j in range(max(i - 2, 0), min(i + 2, len(self._transitions))):
+            candidate = self._offset(self._type_indexes[j])
+            offset = self._offset_at(wall - candidate._seconds)
+            if offset._seconds == candidate._seconds and offset not in possible:
+                possible.append(offset)
+
+        if len(possible) == 1:
+            return dt.replace(tzinfo=possible[0])
+
+        if not possible:
+            if is_dst is None:
+                raise ValueError("Non-existent time %s in %s" % (dt, self.zone))
+            # Use the offset from before the transition for False and after it for True
+            if is_dst:
+                return self.localize(dt + _SIX_HOURS, is_dst) - _SIX_HOURS
+            return self.localize(dt - _SIX_HOURS, is_dst) + _SIX_HOURS
+
+        if is_dst is None:
+            raise ValueError("Ambiguous time %s in %s" % (dt, self.zone))
+        filtered = [offset for offset in possible if bool(offset._dst) == is_dst]
+        if len(filtered) == 1:
+            return dt.replace(tzinfo=filtered[0])
+        # The earliest time in UTC for DST and the latest otherwise
+        possible.sort(key=lambda offset: -offset._seconds)
+        return dt.replace(tzinfo=possible[0 if is_dst else -1])
+
+    def normalize(self, dt):
+        """Corrects the offset of `dt` after arithmetic, like pytz does."""
+        if dt.tzinfo is None:
+            raise ValueError("Naive time - no tzinfo set")
+        return self.fromutc((dt.replace(tzinfo=None) - dt.utcoffset()).replace(tzinfo=self))
+
+    def _wall_offset(self, dt):
+        return self.localize(dt.replace(tzinfo=None)) if dt is not None else None
+
+    def utcoffset(self, dt):
+        dt = self._wall_offset(dt)
+        return dt.utcoffset() if dt is not None else None
+
+    def dst(self, dt):
+        dt = self._wall_offset(dt)
+        return dt.dst() if dt is not None else None
+
+    def tzname(self, dt):
+        dt = self._wall_offset(dt)
+        return dt.tzname() if dt is not None else self.zone
+
+    def __repr__(self):
+        return "<%s %r>" % (type(self).__name__, self.zone)
+
+    def __str__(self):
+        return self.zone
+
+
+class ZoneTable(object):
+    """A zone table file opened with `mmap`.
+
+    Zones are created on first use and kept; they reference the mapped file, which stays open as
+    long as the table or one of its zones is alive.
+    """
+
+    def __init__(self, path=None):
+        path = path or default_path()
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+
+        try:
+            magic, version, _, count, index_offset, strings_offset, version_offset = \
+                _HEADER.unpack_from(self._map, 0)
+        except struct.error:
+            magic = version = None
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("%s is not a zone table of version %d" % (path, FORMAT_VERSION))
+
+        self._strings_offset = strings_offset
+        self.version = self._string(version_offset)
+        self._records = {}
+        for i in range(count):
+            record = _INDEX.unpack_from(self._map, index_offset + i * _INDEX.size)
+            self._records[self._string(record[0])] = record
+        self.names = sorted(self._records)
+        self._zones = {}
+
+    def _string(self, offset):
+        offset += self._strings_offset
+        length = ord(self._map[offset:offset + 1])
+        return self._map[offset + 1:offset + 1 + length].decode('utf-8')
+
+    def _int64s(self, offset, count):
+        if _CAST:
+            # Zero-copy; the memoryview keeps pointing into the mapped file
+            return self._view[offset:offset + count * 8].cast('q')
+        values = array('q')
+        values.fromstring(self._map[offset:offset + count * 8])
+        if sys.byteorder != 'little':
+            values.byteswap()
+        return values
+
+    def _uint8s(self, offset, count):
+        if _CAST:
+            return self._view[offset:offset + count]
+        return array('B', self._map[offset:offset + count])
+
+    def load(self, name):
+        """Creates a new TableZone for `name`; raises KeyError if it is unknown."""
+        _, data_offset, trans_count, types_offset, type_count = self._records[name]
+
+        def load_type(i):
+            utcoffset, dst, abbr = _TYPE.unpack_from(self._map, types_offset + i * _TYPE.size)
+            return utcoffset, dst, self._string(abbr)
+
+        return TableZone(name, self._int64s(data_offset, trans_count),
+                         self._uint8s(data_offset + trans_count * 8, trans_count),
+                         load_type, type_count)
+
+    def zone(self, name):
+        """Returns the (shared) TableZone for `name` or `None` if it is unknown."""
+        zone = self._zones.get(name)
+        if zone is None and name in self._records:
+            zone = self._zones[name] = self.load(name)
+        return zone
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, name):
+        return name in self._records
+
+
+def _zone_data(tz):
+    """Returns the transitions (UTC seconds) and types of a pytz timezone."""
+    utc_transitions = getattr(tz, '_utc_transition_times', None)
+    if utc_transitions is None:
+        # StaticTzInfo and UTC
+        offset = tz.utcoffset(None)
+        return [_BIG_BANG], [0], [(_seconds(offset), 0, tz.tzname(None))]
+
+    types = []
+    indexes = []
+    transitions = []
+    for dt, info in zip(utc_transitions, tz._transition_info):
+        utcoffset, dst, abbr = info
+        typ = (_seconds(utcoffset), _seconds(dst), abbr)
+        if typ not in types:
+            types.append(typ)
+        transitions.append(_stamp(dt))
+        indexes.append(types.index(typ))
+    if len(types) > 255:
+        raise ValueError("Too many types in zone %s" % tz.zone)
+    return transitions, indexes, types
+
+
+def build(path=None, pytz=None):
+    """Compiles all of pytz's timezones into a zone table at `path` and returns their number."""
+    if pytz is None:
+        import pytz
+    path = path or default_path()
+
+    strings = bytearray()
+    string_offsets = {}
+
+    def string(text):
+        offset = string_offsets.get(text)
+        if offset is None:
+            data = text.encode('utf-8')
+            offset = string_offsets[text] = len(strings)
+            strings.append(len(data))
+            strings.extend(data)
+        return offset
+
+    names = sorted(pytz.all_timezones)
+    index_offset = _HEADER.size
+    data = bytearray()
+    data_start = index_offset + len(names) * _INDEX.size
+    # Align the transition arrays to 8 bytes for `memoryview.cast`
+    data_start += -data_start % 8
+    shared = {}
+    records = []
+    for name in names:
+        transitions, indexes, types = _zone_data(pytz.timezone(name))
+        key = (tuple(transitions), tuple(indexes), tuple(types))
+        if key not in shared:
+            data.extend(b'\0' * (-len(data) % 8))
+            data_offset = data_start + len(data)
+            data.extend(struct.pack('<%dq' % len(transitions), *transitions))
+            data.extend(struct.pack('<%dB' % len(indexes), *indexes))
+            types_offset = data_start + len(data)
+            for utcoffset, dst, abbr in types:
+                data.extend(_TYPE.pack(utcoffset, dst, string(abbr)))
+            shared[key] = (data_offset, len(transitions), types_offset, len(types))
+        records.append((string(name),) + shared[key])
+
+    version_offset = string(pytz.OLSON_VERSION)
+    strings_offset = data_start + len(data)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(names), index_offset, strings_offset,
+                          version_offset)
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        for record in records:
+            f.write(_INDEX.pack(*record))
+        f.write(b'\0' * (data_start - index_offset - len(records) * _INDEX.size))
+        f.write(data)
+        f.write(strings)
+    # Replace atomically, since running processes may have the old file mapped
+    if hasattr(os, 'replace'):
+        os.replace(tmp_path, path)
+    else:
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp_path, path)
+    return len(names)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m format_date.zonetable",
+                                     description="Compiles pytz's timezones into a zone table "
+                                                 "for the 'table' timezone backend.")
+    parser.add_argument('-o', '--output', default=default_path(),
+                        help="path of the zone table (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    count = build(args.output)
+    print("Wrote %d zones to %s (%d bytes)" % (count, args.output, os.path.getsize(args.output)))
+
+
+if __name__ == '__main__':
+    main()
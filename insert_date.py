@@ -1,13 +1,26 @@
-import pytz
+import time
+# Start of the plugin's import, reported with PROFILE_LOAD
+_import_start = time.time()
+
+from bisect import bisect_right
+import re
 
 import sublime
 import sublime_plugin
 
 
 try:
-    from .format_date import FormatDate, UnknownTimeZoneError  # ST3
+    from .format_date import (FormatDate, LiveParse, Reformatter,  # ST3
+                              UnknownTimeZoneError, UnknownLocaleError,
+                              load_times, timezone_index,
+                              Instrumentation, StageTimer, pool,
+                              compile_template, is_template, load_locale, setup_locale)
 except ValueError:
-    from format_date import FormatDate, UnknownTimeZoneError  # ST2
+    from format_date import (FormatDate, LiveParse, Reformatter,  # ST2
+                             UnknownTimeZoneError, UnknownLocaleError,
+                             load_times, timezone_index,
+                             Instrumentation, StageTimer, pool,
+                             compile_template, is_template, load_locale, setup_locale)
 
 
 ST2 = int(sublime.version()) < 3000
@@ -21,6 +34,22 @@ fdate = FormatDate()
 s = None
 # Print tracebacks
 DEBUG = False
+# Print how long the stages of loading the plugin took
+PROFILE_LOAD = False
+# Time in seconds that `plugin_loaded` should not exceed
+LOAD_BUDGET = 0.02
+# Delay in milliseconds before caches are warmed up after loading or settings changes
+WARM_UP_DELAY = 1000
+# Longest text in characters between two selections that `replace_selections_each` rewrites to
+# replace both with one edit
+MAX_BATCH_GAP = 1024
+# Settings whose change requires warming up again
+WARM_UP_KEYS = ('format', 'tz_in', 'locale', 'tz_backend',
+                'prompt_config', 'user_prompt_config', 'modified_stamps')
+
+if DEBUG:
+    # Collect timings for "InsertDate: Show Performance Stats"
+    fdate.instrumentation = Instrumentation()
 
 
 def status(msg, e=None):
@@ -35,18 +64,138 @@ def status(msg, e=None):
         traceback.print_exc()
 
 
-def show_timezone_quickpanel(callback, selected_item):
+def show_timezone_quickpanel(callback, selected_item, query=None):
+    """Shows a quick panel with timezones and calls `callback` with the selected name.
+
+    If `query` is given, only zones matching it by offset, abbreviation, city
+    or name are listed. `callback` receives `None` if the panel was cancelled.
+    Each row shows the zone's current abbreviation, offset and local time.
+    """
     global s
     show_quick_panel = sublime.active_window().show_quick_panel
+    index = timezone_index()
+    if query:
+        timezones = index.search(query)
+        if not timezones:
+            status("No timezones found for `%s`" % query)
+            return
+        positions = dict((name, i) for i, name in enumerate(timezones))
+    else:
+        timezones = index.names
+        positions = index.positions
+
+    def on_done(i):
+        callback(timezones[i] if i != -1 else None)
+
+    items = [list(row) for row in zip(timezones, index.describe(timezones, fdate.clock.time()))]
     if ST2:
-        show_quick_panel(pytz.all_timezones, callback)
+        show_quick_panel(items, on_done)
     else:
-        try:
-            selected_index = pytz.all_timezones.index(selected_item)
-        except ValueError:
-            selected_index = 0
-        show_quick_panel(pytz.all_timezones, callback,
-                         selected_index=selected_index)
+        show_quick_panel(items, on_done,
+                         selected_index=positions.get(selected_item, 0))
+
+def replace_selections(view, edit, text):
+    """Replaces all selections with `text` and returns the regions of the inserted text."""
+    inserted = []
+    # Positions of later selections shift by the length inserted before them
+    shift = 0
+    for r in list(view.sel()):
+        begin = r.begin() + shift
+        # Insert when sel is empty to not select the contents
+        if r.empty():
+            view.insert(edit, begin, text)
+        else:
+            view.replace(edit, sublime.Region(begin, r.end() + shift), text)
+        shift += len(text) - r.size()
+        inserted.append(sublime.Region(begin, begin + len(text)))
+    return inserted
+
+
+def protected_regions(view):
+    """Returns the regions that must not be rewritten by `replace_selections_each`.
+
+    These are bookmarks, folds and tracked stamps, which would lose their position if the text
+    they are in was replaced.
+    """
+    regions = view.get_regions('bookmarks') + view.get_regions('mark')
+    if hasattr(view, 'folded_regions'):
+        regions += view.folded_regions()
+    if s is not None:
+        for entry in stamp_entries():
+            regions += view.get_regions(entry['key'])
+    return regions
+
+
+def _batches(view, items):
+    """Splits the `(selection, text)` pairs `items` into runs that can be replaced at once.
+
+    A run ends at a gap between selections that is longer than `MAX_BATCH_GAP` or touches a
+    protected region.
+    """
+    protected = sorted((r.begin(), r.end()) for r in protected_regions(view))
+    begins = [begin for begin, _ in protected]
+    # Largest end of the protected regions up to each index
+    max_ends = []
+    for _, end in protected:
+        max_ends.append(max(end, max_ends[-1]) if max_ends else end)
+
+    batches = [[items[0]]]
+    for (prev, _), item in zip(items, items[1:]):
+        gap_begin, gap_end = prev.end(), item[0].begin()
+        i = bisect_right(begins, gap_end)
+        if gap_end - gap_begin > MAX_BATCH_GAP or (i and max_ends[i - 1] >= gap_begin):
+            batches.append([item])
+        else:
+            batches[-1].append(item)
+    return batches
+
+
+def replace_selections_each(view, edit, texts):
+    """Replaces each selection with the respective item of `texts` and returns the inserted regions.
+
+    Nearby selections are replaced with a single edit of the text spanning them (see `_batches`),
+    since every edit has the buffer move all regions after it, which gets slow with thousands of
+    cursors. The cursors are placed after the inserted texts.
+    """
+    items = list(zip(view.sel(), texts))
+    if not items:
+        return []
+
+    # Going from last to first keeps the positions of the remaining batches valid
+    for batch in reversed(_batches(view, items)):
+        begin, end = batch[0][0].begin(), batch[-1][0].end()
+        if len(batch) == 1:
+            text = batch[0][1]
+        else:
+            span = view.substr(sublime.Region(begin, end))
+            parts = []
+            pos = begin
+            for r, r_text in batch:
+                parts.append(span[pos - begin:r.begin() - begin])
+                parts.append(r_text)
+                pos = r.end()
+            text = "".join(parts)
+        if begin == end:
+            view.insert(edit, begin, text)
+        else:
+            view.replace(edit, sublime.Region(begin, end), text)
+
+    inserted = []
+    shift = 0
+    for r, text in items:
+        begin = r.begin() + shift
+        shift += len(text) - r.size()
+        inserted.append(sublime.Region(begin, begin + len(text)))
+
+    view.sel().clear()
+    for r in inserted:
+        view.sel().add(sublime.Region(r.end()))
+    return inserted
+
+
+# Marks settings that have not been read yet
+_UNSET = object()
+
 
 # I wrote this for InactivePanes, but why not just use it here as well?
 # TODO write methods to change settings and flush changes.
@@ -74,11 +223,12 @@ class Settings(object):
     Sublime Text currently behaves weird with `add_on_change` calls and the callback is run more
     often than it should be (as in, the specified setting didn't actually change), this wrapper
     however tests if one of the values has changed and then calls the callback.
-    `update()` is called before the callback.
+    `update()` is called before the callback and `changed` holds the settings keys that changed.
 
     Methods:
         * update()
-            Reads all the settings and saves them in their respective attributes.
+            Reads all the settings, saves them in their respective attributes and returns the set
+            of settings keys whose value changed.
         * has_changed()
             Returns a boolean if the currently cached settings differ.
         * get_state()
@@ -93,14 +243,29 @@ class Settings(object):
             changes. This is always true when a callback is set.
         * clear_callback(clear_auto_update=False)
             Clears the callback set above and returns it in the process.
+        * add_key_callback(names, callback)
+            Calls `callback(name)` for each of the settings keys `names` whose value changed,
+            before the callback set above.
+        * derive(name, names, func)
+            Registers a value computed by `func()` that is kept until one of the settings keys
+            `names` changes.
+        * derived(name)
+            Returns the value registered with `derive`, computing it first if needed.
     """
     _sobj = None
     _settings = None
     _callback = None
     _auto_update = False
+    # Tag for `add_on_change`; a single listener is notified of changes to any key
+    _tag = "InsertDate.Settings"
 
     def __init__(self, settings_obj, settings, callback=None, auto_update=True):
         self._sobj = settings_obj
+        self._values = {}
+        self._key_callbacks = {}
+        self._derived = {}
+        self._derived_values = {}
+        self.changed = set()
 
         for k, v in settings.items():
             if v is None:
@@ -115,30 +280,47 @@ class Settings(object):
         self.set_callback(callback, auto_update)
 
     def update(self):
+        changed = set()
         for attr, (name, def_value) in self._settings.items():
-            setattr(self, attr, self._sobj.get(name, def_value))
+            value = self._sobj.get(name, def_value)
+            if self._values.get(name, _UNSET) != value:
+                changed.add(name)
+            self._values[name] = value
+            setattr(self, attr, value)
+
+        # Forget derived values that depend on one of the changed keys
+        for name, (names, _) in self._derived.items():
+            if changed.intersection(names):
+                self._derived_values.pop(name, None)
+
+        self.changed = changed
+        return changed
 
     def _on_change(self):
         # Only trigger if relevant settings changed
-        if self.has_changed():
-            self.update()
-            if self._callback:
-                self._callback()
+        changed = self.update()
+        if not changed:
+            return
+        for name in sorted(changed):
+            for callback in self._key_callbacks.get(name, ()):
+                callback(name)
+        if self._callback:
+            self._callback()
 
     def _register(self, callback):
-        for name, _ in self._settings.values():
-            self._sobj.add_on_change(name, callback)
+        self._sobj.add_on_change(self._tag, callback)
 
     def _unregister(self):
-        for name, _ in self._settings.values():
-            self._sobj.clear_on_change(name)
+        self._sobj.clear_on_change(self._tag)
 
     def has_changed(self):
-        return self.get_state() != self.get_real_state()
+        for name, def_value in self._settings.values():
+            if self._values.get(name, _UNSET) != self._sobj.get(name, def_value):
+                return True
+        return False
 
     def get_state(self):
-        return dict((name, getattr(self, attr))
-                    for attr, (name, _) in self._settings.items())
+        return dict(self._values)
 
     def get_real_state(self):
         return dict((name, self._sobj.get(name, def_value))
@@ -163,17 +345,165 @@ class Settings(object):
         self._callback = None
         return cb
 
+    def add_key_callback(self, names, callback):
+        if not callable(callback):
+            raise TypeError("callback must be callable")
+        for name in names:
+            self._key_callbacks.setdefault(name, []).append(callback)
+
+    def derive(self, name, names, func):
+        self._derived[name] = (tuple(names), func)
+        self._derived_values.pop(name, None)
+
+    def derived(self, name):
+        try:
+            return self._derived_values[name]
+        except KeyError:
+            value = self._derived_values[name] = self._derived[name][1]()
+            return value
+
+
+def expand_prompt_config(prompt_config, user_prompt_config, default_format):
+    """Validates the panel's configurations and substitutes `$default` in their formats.
+
+    Returns a tuple of the `(name, config)` entries and a list of error messages.
+    """
+    errors = []
+    if not isinstance(prompt_config, list):
+        errors.append("`prompt_config` setting is invalid")
+        prompt_config = []
+    configs = prompt_config
+    if not isinstance(user_prompt_config, list):
+        errors.append("`user_prompt_config` setting is invalid")
+    else:
+        configs = configs + user_prompt_config
+
+    entries = []
+    for conf in configs:
+        if not isinstance(conf, dict) or not isinstance(conf.get('name'), basestring):
+            errors.append("Skipped invalid configuration `%s`" % (conf,))
+            continue
+
+        c = dict()
+        c['tz_in'] = conf.get('tz_in')
+        c['tz_out'] = conf.get('tz_out')
+        c['format'] = conf.get('format')
+        c['locale'] = conf.get('locale')
+
+        if isinstance(c['format'], basestring):
+            c['format'] = c['format'].replace("$default", default_format)
+
+        entries.append((conf['name'], c))
+    return entries, errors
+
+
+def expand_stamp_config(modified_stamps, default_format):
+    """Validates the `modified_stamps` setting and substitutes `$default` in its formats.
+
+    Returns a tuple of the stamp entries and a list of error messages. Each entry is a dict with
+    the `prefix`, the `key` for `view.add_regions`, the `pattern` that finds the stamps after the
+    prefix and the `config` with the parameters of `FormatDate.parse`.
+    """
+    if not isinstance(modified_stamps, list):
+        return [], ["`modified_stamps` setting is invalid"]
+
+    entries = []
+    errors = []
+    for conf in modified_stamps:
+        if (not isinstance(conf, dict) or not isinstance(conf.get('prefix'), basestring)
+                or not conf['prefix'].strip() or '\n' in conf['prefix']):
+            errors.append("Skipped invalid stamp configuration `%s`" % (conf,))
+            continue
+
+        c = dict()
+        c['tz_in'] = conf.get('tz_in')
+        c['tz_out'] = conf.get('tz_out')
+        c['format'] = conf.get('format')
+        c['locale'] = conf.get('locale')
+
+        if isinstance(c['format'], basestring):
+            c['format'] = c['format'].replace("$default", default_format)
+
+        prefix = conf['prefix']
+        entries.append(dict(
+            prefix=prefix,
+            key="insert_date.stamp:" + prefix,
+            # The stamp is the rest of the line, without trailing whitespace
+            pattern=re.compile(re.escape(prefix) + r'([^\r\n]*?)[ \t]*$', re.MULTILINE),
+            config=c
+        ))
+    return entries, errors
+
+
+def stamp_entries():
+    return s.derived('stamp_entries')
+
+
+def stamp_entry(before, entries):
+    """Returns the entry whose prefix `before` ends with, the longest one if several match."""
+    found = None
+    for entry in entries:
+        if before.endswith(entry['prefix']) and (
+                found is None or len(entry['prefix']) > len(found['prefix'])):
+            found = entry
+    return found
+
+
+def scan_stamps(view, entries):
+    """Tracks the stamps in the first `modified_stamps_scan_size` characters of `view`."""
+    text = view.substr(sublime.Region(0, min(view.size(), s.modified_stamps_scan_size)))
+    for entry in entries:
+        regions = []
+        for m in entry['pattern'].finditer(text):
+            # Each stamp belongs to one entry only, even if a prefix ends with another one
+            line_start = text.rfind('\n', 0, m.start(1)) + 1
+            if stamp_entry(text[line_start:m.start(1)], entries) is entry:
+                regions.append(sublime.Region(m.start(1), m.end(1)))
+        # The last line may have been cut off by the window
+        regions = [r for r in regions if r.end() < len(text) or len(text) == view.size()]
+        if regions:
+            add_stamp_regions(view, entry['key'], view.get_regions(entry['key']) + regions)
+
+
+def track_stamps(view, regions):
+    """Tracks those of the inserted `regions` that directly follow a stamp prefix."""
+    entries = stamp_entries()
+    if not entries:
+        return
+    for r in regions:
+        line_start = view.line(r.begin()).begin()
+        entry = stamp_entry(view.substr(sublime.Region(line_start, r.begin())), entries)
+        if entry is not None:
+            add_stamp_regions(view, entry['key'], view.get_regions(entry['key']) + [r])
+
+
+def insert_text(view, edit, text):
+    """Replaces all selections with `text` and tracks it if it is a stamp.
+
+    All commands that insert a single date go through this.
+    """
+    track_stamps(view, replace_selections(view, edit, text))
+
+
+def add_stamp_regions(view, key, regions):
+    # Hidden regions are still moved along with edits of the buffer
+    unique = dict(((r.begin(), r.end()), r) for r in regions)
+    view.add_regions(key, [unique[k] for k in sorted(unique)], "", "", sublime.HIDDEN)
+
 
 ################################################################################
 # The actual commands
 
-# TODO `locale` setting to modify `%c %x %X %p` representation?
 # TODO `shift` param
 class InsertDateCommand(sublime_plugin.TextCommand):
 
-    """Prints Date according to given format string."""
+    """Prints Date according to given format string.
+
+    `locale` selects the locale for `%c`, `%x`, `%X`, `%p` and names (like
+    "de_DE.UTF-8"); defaults to the "locale" setting.
+    """
 
-    def run(self, edit, format=None, tz_in=None, tz_out=None):
+    def run(self, edit, format=None, tz_in=None, tz_out=None, locale=None):
         if format is not None:
             if format == '' or not isinstance(format, basestring) or format.isspace():
                 # Not a string, empty or only whitespaces
@@ -181,8 +511,8 @@ class InsertDateCommand(sublime_plugin.TextCommand):
 
         # Do the actual parse action
         try:
-            text = fdate.parse(format, tz_in, tz_out)
-        except UnknownTimeZoneError as e:
+            text = fdate.parse(format, tz_in, tz_out, locale)
+        except (UnknownTimeZoneError, UnknownLocaleError) as e:
             status(str(e).strip('"'), e)
             return
         except Exception as e:
@@ -193,13 +523,146 @@ class InsertDateCommand(sublime_plugin.TextCommand):
         if not text or text.isspace():
             return
 
-        # Do replacements
-        for r in self.view.sel():
-            # Insert when sel is empty to not select the contents
-            if r.empty():
-                self.view.insert(edit, r.a, text)
+        insert_text(self.view, edit, text)
+
+
+class InsertDateSeriesCommand(sublime_plugin.TextCommand):
+
+    """Inserts a series of dates that are `step` apart, like "+1d", "15m" or "-1w".
+
+    Without `count`, each selection receives the next date of the series, in order. Otherwise
+    `count` lines with the series are inserted at each selection. The series starts at `start`,
+    an ISO date like "2024-01-05" or "2024-01-05 13:00", or at the current time. Steps of days
+    and weeks keep the time of day across DST changes.
+    """
+
+    def run(self, edit, step="+1d", count=None, start=None, format=None, tz_in=None,
+            tz_out=None, locale=None):
+        view = self.view
+        sels = len(view.sel())
+        try:
+            dates = fdate.series(sels if count is None else count, step, start, format, tz_in,
+                                 tz_out, locale)
+        except (UnknownTimeZoneError, UnknownLocaleError) as e:
+            status(str(e).strip('"'), e)
+            return
+        except Exception as e:
+            status("Error generating date series `%s`" % step, e)
+            return
+
+        if count is None:
+            texts = dates
+        else:
+            texts = ["\n".join(dates)] * sels
+        regions = replace_selections_each(view, edit, texts)
+        track_stamps(view, regions)
+
+
+class InsertDateRefreshStampsCommand(sublime_plugin.TextCommand):
+
+    """Re-renders the tracked stamps of `modified_stamps`; run before saving.
+
+    Stamps whose prefix has been removed are no longer tracked.
+    """
+
+    def run(self, edit):
+        view = self.view
+        entries = stamp_entries()
+        if not entries:
+            return
+
+        stamps = []
+        for entry in entries:
+            for r in view.get_regions(entry['key']):
+                line_start = view.line(r.begin()).begin()
+                before = view.substr(sublime.Region(line_start, r.begin()))
+                if stamp_entry(before, entries) is entry:
+                    stamps.append((r, entry))
+            view.erase_regions(entry['key'])
+        if not stamps:
+            return
+
+        # All stamps show the same time and are rendered only once per configuration
+        results = fdate.parse_many([entry['config'] for entry in entries])
+        texts = {}
+        for entry, (text, e) in zip(entries, results):
+            if e is not None:
+                status("Error refreshing stamps after `%s`" % entry['prefix'], e)
+            texts[entry['key']] = text
+
+        regions = dict((entry['key'], []) for entry in entries)
+        shift = 0
+        # End of the last stamp before the edits
+        last_end = -1
+        for r, entry in sorted(stamps, key=lambda stamp: stamp[0].begin()):
+            if r.begin() < last_end:
+                # Overlaps a stamp that has been replaced already
+                continue
+            last_end = r.end()
+            key = entry['key']
+            r = sublime.Region(r.begin() + shift, r.end() + shift)
+            text = texts[key]
+            if text is not None and text != view.substr(r):
+                view.replace(edit, r, text)
+                shift += len(text) - r.size()
+                r = sublime.Region(r.begin(), r.begin() + len(text))
+            regions[key].append(r)
+
+        for key, key_regions in regions.items():
+            if key_regions:
+                add_stamp_regions(view, key, key_regions)
+
+
+class ReformatDateCommand(sublime_plugin.TextCommand):
+
+    """Re-renders existing timestamps in the selections or, if nothing is
+    selected, the whole view.
+
+    `inputs` is a list of the timestamp formats to look for ("iso", "unix"
+    and "unix_ms"; default: ["iso", "unix"]). Naive timestamps are
+    interpreted in `tz_in` and all are converted to `tz_out`.
+    """
+
+    def run(self, edit, format=None, tz_in=None, tz_out=None, inputs=None):
+        view = self.view
+        try:
+            if inputs is None:
+                reformatter = Reformatter(fdate, format, tz_in, tz_out)
             else:
-                self.view.replace(edit, r, text)
+                reformatter = Reformatter(fdate, format, tz_in, tz_out, inputs)
+        except UnknownTimeZoneError as e:
+            status(str(e).strip('"'), e)
+            return
+        except Exception as e:
+            status("Error parsing parameters", e)
+            return
+
+        regions = [r for r in view.sel() if not r.empty()]
+        if not regions:
+            regions = [sublime.Region(0, view.size())]
+
+        # Replacements are applied while the view is read in chunks,
+        # so positions need to be shifted by the change in length so far
+        shift = [0]
+
+        def read(a, b):
+            return view.substr(sublime.Region(a + shift[0], b + shift[0]))
+
+        count = 0
+        try:
+            for r in regions:
+                for begin, end, text in reformatter.iter_replacements(read, r.begin(), r.end()):
+                    view.replace(edit, sublime.Region(begin + shift[0], end + shift[0]), text)
+                    shift[0] += len(text) - (end - begin)
+                    count += 1
+        except Exception as e:
+            status("Error reformatting timestamps", e)
+            return
+
+        msg = "Reformatted %d timestamp%s" % (count, "" if count == 1 else "s")
+        if reformatter.skipped:
+            msg += ", skipped %d invalid" % reformatter.skipped
+        status(msg)
 
 
 class InsertDatePromptCommand(sublime_plugin.TextCommand):
@@ -209,9 +672,10 @@ class InsertDatePromptCommand(sublime_plugin.TextCommand):
     If "format" is provided, it will be pre-inserted into the prompt.
     """
 
-    def run(self, edit, format=None, tz_in=None, tz_out=None):
+    def run(self, edit, format=None, tz_in=None, tz_out=None, locale=None):
         self.tz_in = tz_in
         self.tz_out = tz_out
+        self.locale = locale
 
         # Unset save_on_focus_lost so that ST doesn't save and remove trailing
         # whitespace when the input/quick panel is opened, if that option is
@@ -249,99 +713,350 @@ class InsertDatePromptCommand(sublime_plugin.TextCommand):
                                    "(press 'esc' to use same as input)")
             show_timezone_quickpanel(self.on_tz_out, self.tz_in or s.tz_in)
 
-    def on_tz_out(self, index):
-        if index != -1:
-            self.tz_out = pytz.all_timezones[index]
+    def on_tz_out(self, timezone):
+        if timezone is not None:
+            self.tz_out = timezone
         self.run_for_real()
 
     def run_for_real(self):
         self.view.settings().erase('save_on_focus_lost')
         self.view.run_command(
             'insert_date',
-            {'format': self.format, 'tz_in': self.tz_in, 'tz_out': self.tz_out}
+            {'format': self.format, 'tz_in': self.tz_in, 'tz_out': self.tz_out,
+             'locale': self.locale}
         )
 
 
 class InsertDatePanelCommand(sublime_plugin.TextCommand):
 
-    """Shows a quick panel with configurable templates that are previewed."""
+    """Shows a quick panel with configurable templates that are previewed.
+
+    If `live` is true, the previews are refreshed while the panel is open and
+    the selected entry is inserted exactly as shown (ST3 only). Refreshing
+    shows the panel again, which would clear its filter text, so it stops
+    once the user starts typing (see `InsertDateLivePanelListener`).
+    """
 
-    panel_cache = []
-    config_map = {}
+    # Increased whenever a panel is shown or closed; stops outdated ticks and callbacks
+    generation = 0
+    # The panel that is currently refreshed, if any
+    refreshing = None
 
-    def run(self, edit, tz_in=None, tz_out=None):
+    def run(self, edit, tz_in=None, tz_out=None, live=None):
         self.panel_cache = []
         self.config_map = {}
+        self.generation += 1
 
-        if not isinstance(s.prompt_config, list):
-            status("`prompt_config` setting is invalid")
-            return
-
-        configs = s.prompt_config
-        if not isinstance(s.user_prompt_config, list):
-            status("`user_prompt_config` setting is invalid")
-        else:
-            configs = configs + s.user_prompt_config
+        # Validated and expanded only when the settings change
+        entries, errors = s.derived('prompt_entries')
+        for msg in errors:
+            status(msg)
+        if tz_in or tz_out:
+            entries = [(name, dict(c, tz_in=tz_in or c['tz_in'], tz_out=tz_out or c['tz_out']))
+                       for name, c in entries]
 
-        if not configs:
+        if not entries:
             status("No configurations found to choose from")
             return
 
-        # Generate panel cache for quick_panel
-        for conf in configs:
-            # Read config
-            c = dict()
-            c['tz_in']  = tz_in if tz_in else conf.get('tz_in')
-            c['tz_out'] = tz_out if tz_out else conf.get('tz_out')
-            c['format'] = conf.get('format')
-
-            if isinstance(c['format'], basestring):
-                c['format'] = c['format'].replace("$default", fdate.default['format'])
-
-            # Do the actual parse action
-            try:
-                text = fdate.parse(**c)
-            except UnknownTimeZoneError as e:
-                status(str(e).strip('"'), e)
-                return
-            except Exception as e:
-                status('Error parsing format string `%s`' % format, e)
-                return
+        if live is None:
+            live = s.live_panel
+        # ST2's quick panel can not be updated in place
+        self.live = None
+        if live and not ST2:
+            self.live = LiveParse(fdate, [c for _, c in entries])
+            self.live.update()
+            results = self.live.results
+        else:
+            # Do the actual parse action, skipping erroneous entries
+            results = fdate.parse_many([c for _, c in entries], s.derived('panel_workers'))
 
-            self.panel_cache.append([conf['name'], text])
-            self.config_map[conf['name']] = c
+        # Generate panel cache for quick_panel
+        # and remember which row displays which entry
+        self.rows = {}
+        for i, ((name, c), (text, e)) in enumerate(zip(entries, results)):
+            if e is not None:
+                if isinstance(e, (UnknownTimeZoneError, UnknownLocaleError)):
+                    status(str(e).strip('"'), e)
+                else:
+                    status('Error parsing format string `%s`' % c['format'], e)
+                continue
+
+            self.rows[i] = len(self.panel_cache)
+            self.panel_cache.append([name, text])
+            self.config_map[name] = c
+
+        if not self.panel_cache:
+            return
 
         # Unset save_on_focus_lost so that ST doesn't save and remove trailing
         # whitespace when the quick panel is opened, if that option is also
         # enabled. (#26)
         self.view.settings().set('save_on_focus_lost', False)
-        self.view.window().show_quick_panel(self.panel_cache, self.on_done)
+        if self.live:
+            self.selected_index = 0
+            self.show_panel()
+            InsertDatePanelCommand.refreshing = self
+            self.schedule_tick()
+        else:
+            self.view.window().show_quick_panel(self.panel_cache, self.on_done)
+
+    def show_panel(self):
+        # Showing a new panel cancels the old one, which we need to ignore
+        self.generation += 1
+        generation = self.generation
+
+        def on_done(index):
+            if generation == self.generation:
+                self.on_done(index)
+
+        self.view.window().show_quick_panel(self.panel_cache, on_done, 0,
+                                            self.selected_index, self.on_highlight)
+
+    def on_highlight(self, index):
+        self.selected_index = index
+
+    def schedule_tick(self):
+        generation = self.generation
+        # Tick shortly after the next full second
+        delay = 1010 - int(time.time() * 1000) % 1000
+        sublime.set_timeout(lambda: self.tick(generation), delay)
+
+    def stop_refreshing(self):
+        if InsertDatePanelCommand.refreshing is self:
+            InsertDatePanelCommand.refreshing = None
+
+    def tick(self, generation):
+        if generation != self.generation or not self.view.window():
+            # Panel has been closed
+            self.stop_refreshing()
+            return
+        if InsertDatePanelCommand.refreshing is not self:
+            # The user is filtering the entries
+            return
+
+        refresh = False
+        for i in self.live.update():
+            text, e = self.live.results[i]
+            if i in self.rows and e is None:
+                self.panel_cache[self.rows[i]][1] = text
+                refresh = True
+
+        if refresh:
+            self.show_panel()
+        self.schedule_tick()
 
     def on_done(self, index):
+        self.generation += 1
+        self.stop_refreshing()
         # Erase our settings override
         self.view.settings().erase('save_on_focus_lost')
         if index == -1:
             return
 
-        name = self.panel_cache[index][0]
-        self.view.run_command('insert_date', self.config_map[name])
+        name, text = self.panel_cache[index]
+        if self.live:
+            # Insert what was on screen instead of rendering again
+            self.view.run_command('insert_date_text', {'text': text})
+        else:
+            self.view.run_command('insert_date', self.config_map[name])
+
+
+class InsertDateTextCommand(sublime_plugin.TextCommand):
+
+    """Replaces the selections with `text`; used for the previews of live panels."""
+
+    def run(self, edit, text):
+        insert_text(self.view, edit, text)
+
+
+class InsertDateLivePanelListener(sublime_plugin.EventListener):
+
+    """Stops refreshing a live panel once its filter text is modified."""
+
+    def on_modified(self, view):
+        if (InsertDatePanelCommand.refreshing is not None
+                and view.settings().get('is_widget')):
+            InsertDatePanelCommand.refreshing = None
+
+
+class InsertDateStampListener(sublime_plugin.EventListener):
+
+    """Refreshes the stamps of `modified_stamps` when a modified view is saved.
+
+    Files are only searched for stamps once, when loaded, and only within the
+    first `modified_stamps_scan_size` characters. Afterwards the stamps are
+    tracked as regions, so saving never searches the buffer.
+    """
+
+    # Ids of the views that have been searched for stamps
+    scanned = set()
+
+    def scan(self, view):
+        self.scanned.add(view.id())
+        entries = stamp_entries()
+        if entries:
+            scan_stamps(view, entries)
+
+    def on_load(self, view):
+        if s is not None:
+            self.scan(view)
+
+    def on_pre_save(self, view):
+        if s is None or not s.modified_stamps or not view.is_dirty():
+            return
+        if view.id() not in self.scanned:
+            # Opened before the plugin was loaded
+            self.scan(view)
+        view.run_command('insert_date_refresh_stamps')
+
+    def on_close(self, view):
+        self.scanned.discard(view.id())
 
 
 class InsertDateSelectTimezone(sublime_plugin.ApplicationCommand):
 
+    """Sets the `tz_in` setting from a quick panel of timezones.
+
+    `query` limits the panel to zones matching it (see `TimezoneIndex.search`).
+    If `prompt` is true, the query is asked for first.
+    """
+
     @staticmethod
-    def on_select(index):
+    def on_select(timezone):
         global s
-        if index == -1:
+        if timezone is None:
             return
-        timezone = pytz.all_timezones[index]
         s._sobj.set('tz_in', timezone)
         s._sobj.erase('silence_timezone_request')
         sublime.save_settings('insert_date.sublime-settings')
 
-    def run(self):
+    def run(self, query=None, prompt=False):
         global s
-        show_timezone_quickpanel(self.on_select, s.tz_in)
+        if prompt:
+            sublime.active_window().show_input_panel(
+                "Timezone offset, abbreviation or name:", query or "",
+                lambda query: show_timezone_quickpanel(self.on_select, s.tz_in, query),
+                None, None
+            )
+        else:
+            show_timezone_quickpanel(self.on_select, s.tz_in, query)
+
+
+class InsertDateShowStatsCommand(sublime_plugin.ApplicationCommand):
+
+    """Prints the durations of each stage of rendering a date to the console.
+
+    Requires `DEBUG` to be enabled.
+    """
+
+    def run(self, clear=False):
+        if fdate.instrumentation is None:
+            if not DEBUG:
+                status("Performance stats are only collected with DEBUG enabled")
+                return
+            fdate.instrumentation = Instrumentation()
+            status("Collecting performance stats from now on")
+            return
+
+        if clear:
+            fdate.instrumentation.clear()
+            status("Performance stats cleared")
+            return
+
+        print("[InsertDate] Performance stats:\n" + fdate.instrumentation.report())
+        status("Performance stats printed to console")
+        sublime.active_window().run_command('show_panel', {'panel': 'console'})
+
+################################################################################
+# Warm-up
+
+# Increased to cancel a scheduled or running warm-up
+_warm_up_generation = 0
+
+
+def schedule_warm_up(delay=WARM_UP_DELAY):
+    """Warms up the caches in the background, cancelling a previous warm-up.
+
+    Locales are loaded on the main thread first, since loading one switches
+    the process' LC_TIME for a moment and other plugins may call strftime.
+    The rest uses the async thread on ST3; ST2 has none and runs it later on
+    the main thread.
+    """
+    global _warm_up_generation
+    _warm_up_generation += 1
+    generation = _warm_up_generation
+    sublime.set_timeout(lambda: warm_up_locales(generation), delay)
+
+
+def cancel_warm_up():
+    global _warm_up_generation
+    _warm_up_generation += 1
+
+
+def warm_up_configs():
+    configs = [dict(tz_in=s.tz_in)]
+    configs += [c for _, c in s.derived('prompt_entries')[0]]
+    configs += [entry['config'] for entry in stamp_entries()]
+    return configs
+
+
+def config_locales(configs):
+    """Returns the names of the locales used to render `configs`."""
+    names = set()
+    for config in configs:
+        locale = config.get('locale') or s.locale
+        format = config.get('format') or s.format
+        if is_template(format):
+            try:
+                template = compile_template(format)
+            except Exception:
+                continue
+            names.update(params.get('locale', locale) for _, params in template.fields)
+        names.add(locale)
+    names.discard(None)
+    return names
+
+
+def warm_up_locales(generation):
+    if s is None or generation != _warm_up_generation:
+        return
+    start = time.time()
+    setup_locale()
+    for name in config_locales(warm_up_configs()):
+        try:
+            load_locale(name)
+        except UnknownLocaleError:
+            pass
+
+    if PROFILE_LOAD:
+        print("[InsertDate] Loading locales took %.2f ms" % ((time.time() - start) * 1000))
+    set_timeout = getattr(sublime, 'set_timeout_async', sublime.set_timeout)
+    set_timeout(lambda: warm_up(generation), 0)
+
+
+def warm_up(generation):
+    """Resolves all configured timezones and renders the configurations once.
+
+    This loads pytz and fills the caches of timezones and compiled formats,
+    so that the first panel does not have to. The locales have been loaded by
+    `warm_up_locales` already. Errors are ignored here and reported once the
+    configurations are used.
+    """
+    if s is None:
+        return
+    start = time.time()
+    configs = warm_up_configs()
+
+    for config in configs:
+        if generation != _warm_up_generation:
+            # Cancelled or restarted
+            return
+        fdate.parse_many([config])
+
+    if PROFILE_LOAD:
+        print("[InsertDate] Warm-up of %d configurations took %.2f ms"
+              % (len(configs), (time.time() - start) * 1000))
 
 ################################################################################
 
@@ -349,28 +1064,72 @@ class InsertDateSelectTimezone(sublime_plugin.ApplicationCommand):
 def plugin_loaded():
     global s
 
+    timer = StageTimer()
+
     s = Settings(
         sublime.load_settings('insert_date.sublime-settings'),
         settings=dict(
             format=('format', '%c'),
             tz_in=('tz_in', 'local'),
+            locale=('locale', None),
+            tz_backend=('tz_backend', 'pytz'),
             prompt_config=('prompt_config', []),
             user_prompt_config=('user_prompt_config', []),
+            live_panel=('live_panel', False),
+            panel_workers=('panel_workers', 1),
+            modified_stamps=('modified_stamps', []),
+            modified_stamps_scan_size=('modified_stamps_scan_size', 4096),
             silence_timezone_request=None
         )
     )
 
     # Register on settings changes
-    def on_settings_changed(initial=False):
-        global fdate
+    def on_settings_changed():
+        status("settings changed")
 
-        if not initial:
-            status("settings changed")
+    def on_default_changed(name):
         # These defaults will be used when the command's parameters are None
-        fdate.set_default(s.get_state())
+        fdate.set_default({name: getattr(s, name)})
 
-    on_settings_changed(True)  # Apply initial settings
+    def on_backend_changed(name=None):
+        try:
+            fdate.set_backend(s.tz_backend)
+        except ValueError as e:
+            status("`tz_backend` setting is invalid or not available; using pytz", e)
+            fdate.set_backend('pytz')
+
+    s.derive('prompt_entries', ('prompt_config', 'user_prompt_config', 'format'),
+             lambda: expand_prompt_config(s.prompt_config, s.user_prompt_config, s.format))
+
+    def expand_stamps():
+        # Reported once per change of the settings instead of on every save
+        entries, errors = expand_stamp_config(s.modified_stamps, s.format)
+        for msg in errors:
+            status(msg)
+        return entries
+
+    s.derive('stamp_entries', ('modified_stamps', 'format'), expand_stamps)
+
+    def panel_workers():
+        try:
+            return max(1, int(s.panel_workers))
+        except (TypeError, ValueError) as e:
+            status("`panel_workers` setting is invalid; using 1", e)
+            return 1
+
+    s.derive('panel_workers', ('panel_workers',), panel_workers)
+
+    timer.mark("load settings")
+
+    fdate.set_default(s.get_state())  # Apply initial settings
+    on_backend_changed()
+    s.add_key_callback(fdate.default.keys(), on_default_changed)
+    s.add_key_callback(['tz_backend'], on_backend_changed)
+    s.add_key_callback(WARM_UP_KEYS, lambda name: schedule_warm_up())
     s.set_callback(on_settings_changed)
+    timer.mark("apply settings")
+
+    schedule_warm_up()
 
     if s.tz_in == 'local' and not s.silence_timezone_request:
         # Request user to set a timezone - later
@@ -391,13 +1150,27 @@ def plugin_loaded():
 
         sublime.set_timeout(request_timezone, 3000)
 
+    timer.mark("finish")
+    if PROFILE_LOAD:
+        print("[InsertDate] Import took %.2f ms" % (_import_time * 1000))
+        print("[InsertDate] plugin_loaded stages:\n" + timer.report(LOAD_BUDGET))
+        print("[InsertDate] Deferred so far: %s"
+              % (", ".join("%s (%.2f ms)" % (name, duration * 1000)
+                           for name, duration in load_times)
+                 or "nothing"))
+
 
 def plugin_unloaded():
     global s
 
+    cancel_warm_up()
+    pool.shutdown()
     if s:
         s.clear_callback(True)
 
+# Everything above is part of importing the plugin
+_import_time = time.time() - _import_start
+
 # ST2 backwards (and don't call it twice in ST3)
 unload_handler = plugin_unloaded if ST2 else lambda: None
 
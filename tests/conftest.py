@@ -0,0 +1,120 @@
+"""Loads the plugin outside of Sublime Text, with a minimal stand-in for its API."""
+
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class Region(object):
+    def __init__(self, a, b=None):
+        self.a = a
+        self.b = a if b is None else b
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+    def size(self):
+        return self.end() - self.begin()
+
+    def empty(self):
+        return self.a == self.b
+
+    def __eq__(self, other):
+        return (self.a, self.b) == (other.a, other.b)
+
+    def __repr__(self):
+        return "Region(%d, %d)" % (self.a, self.b)
+
+
+class Selection(list):
+    def clear(self):
+        del self[:]
+
+    def add(self, region):
+        self.append(region)
+
+
+class View(object):
+    """A buffer whose regions move along with edits like in Sublime Text."""
+
+    def __init__(self, text):
+        self.text = text
+        self.regions = {}
+        self.selection = Selection()
+        self.edits = 0
+
+    def size(self):
+        return len(self.text)
+
+    def substr(self, region):
+        return self.text[region.begin():region.end()]
+
+    def line(self, point):
+        begin = self.text.rfind('\n', 0, point) + 1
+        end = self.text.find('\n', point)
+        return Region(begin, len(self.text) if end == -1 else end)
+
+    def _edit(self, begin, end, text):
+        self.edits += 1
+        delta = len(text) - (end - begin)
+        self.text = self.text[:begin] + text + self.text[end:]
+
+        def move(point):
+            if point >= end:
+                return point + delta
+            return min(point, begin + len(text)) if point > begin else point
+        for key, regions in self.regions.items():
+            self.regions[key] = [Region(move(r.a), move(r.b)) for r in regions]
+
+    def insert(self, edit, point, text):
+        self._edit(point, point, text)
+        return len(text)
+
+    def replace(self, edit, region, text):
+        self._edit(region.begin(), region.end(), text)
+
+    def add_regions(self, key, regions, *args):
+        self.regions[key] = list(regions)
+
+    def get_regions(self, key):
+        return list(self.regions.get(key, []))
+
+    def erase_regions(self, key):
+        self.regions.pop(key, None)
+
+    def sel(self):
+        return self.selection
+
+    def id(self):
+        return id(self)
+
+
+def _install_stubs():
+    sublime = types.ModuleType('sublime')
+    sublime.HIDDEN = 128
+    sublime.Region = Region
+    sublime.version = lambda: "3211"
+    sublime.status_message = lambda msg: None
+    sublime.set_timeout = lambda func, delay=0: None
+    sublime.set_timeout_async = lambda func, delay=0: None
+    sys.modules['sublime'] = sublime
+
+    sublime_plugin = types.ModuleType('sublime_plugin')
+    for name in ('TextCommand', 'EventListener', 'ApplicationCommand'):
+        setattr(sublime_plugin, name, type(name, (object,), {
+            '__init__': lambda self, view=None: setattr(self, 'view', view)}))
+    sys.modules['sublime_plugin'] = sublime_plugin
+
+    # The plugin imports format_date relatively, as a package of Sublime Text
+    package = types.ModuleType('InsertDate')
+    package.__path__ = [ROOT]
+    sys.modules['InsertDate'] = package
+
+
+_install_stubs()
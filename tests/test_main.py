@@ -0,0 +1,68 @@
+import io
+import os
+
+import pytest
+
+from format_date import FormatDate, Reformatter
+from format_date import __main__ as main
+
+
+@pytest.fixture
+def reformatter():
+    return Reformatter(FormatDate(), "%Y/%m/%d %H.%M.%S", "UTC", "UTC")
+
+
+# No line breaks, with timestamps and multi-byte characters across block boundaries
+TEXT = "".join("é 2024-01-05 13:%02d:00 ß 1704459600 ü 2024-02-30 10:00 " % (i % 60)
+               for i in range(2000))
+
+
+@pytest.mark.parametrize('size', [1000, 1031, 1 << 16])
+@pytest.mark.parametrize('text', [TEXT, TEXT.replace("ß", "\n")])
+def test_reformat_stream_reads_blocks(monkeypatch, reformatter, size, text):
+    monkeypatch.setattr(main, 'BUFFER_SIZE', size)
+    reads = []
+
+    class Input(io.BytesIO):
+        def read1(self, size=-1):
+            reads.append(size)
+            return io.BytesIO.read1(self, size)
+
+    out = io.StringIO()
+    main.reformat_stream(reformatter, Input(text.encode('utf-8')), out)
+
+    assert out.getvalue() == reformatter.reformat_text(text)
+    assert set(reads) == {size}
+
+
+def test_reformat_stream_writes_available_lines(reformatter):
+    # What a pipe returns over time, like with `tail -f`
+    reads = [b"1704459600 a\n", b"b\n", b""]
+    out = io.StringIO()
+
+    class Input(object):
+        def read1(self, size):
+            # Every complete line is written before waiting for more input
+            assert out.getvalue().count("\n") == 3 - len(reads)
+            return reads.pop(0)
+
+    main.reformat_stream(reformatter, Input(), out)
+    assert out.getvalue() == "2024/01/05 13.00.00 a\nb\n"
+
+
+@pytest.mark.parametrize('size', [1000, 1031])
+def test_process_range_reads_blocks(monkeypatch, tmp_path, reformatter, size):
+    monkeypatch.setattr(main, 'BUFFER_SIZE', size)
+    monkeypatch.setattr(main, '_reformatter', reformatter)
+    path = tmp_path / "input.log"
+    path.write_bytes(TEXT.encode('utf-8') + b"\n" + TEXT.encode('utf-8'))
+
+    parts = []
+    for start, end in main._split_file(str(path), 3):
+        out_path, _ = main._process_range((str(path), start, end, None))
+        with io.open(out_path, encoding='utf-8', newline='') as f:
+            parts.append(f.read())
+        os.remove(out_path)
+
+    assert len(parts) == 2
+    assert "".join(parts) == reformatter.reformat_text(TEXT + "\n" + TEXT)
@@ -0,0 +1,53 @@
+from conftest import Region, View
+from InsertDate import insert_date
+
+
+def cursors(view, points):
+    view.sel().clear()
+    for point in points:
+        view.sel().add(Region(point))
+
+
+def test_nearby_selections_are_replaced_at_once():
+    view = View("x\n" * 1000)
+    cursors(view, range(0, 2000, 2))
+    texts = [str(i) for i in range(1000)]
+    inserted = insert_date.replace_selections_each(view, None, texts)
+
+    assert view.edits == 1
+    assert view.text == "".join("%dx\n" % i for i in range(1000))
+    assert [view.substr(r) for r in inserted] == texts
+    assert list(view.sel()) == [Region(r.end()) for r in inserted]
+
+
+def test_selections_are_replaced_with_their_text():
+    view = View("aaa bbb ccc")
+    view.sel().clear()
+    view.sel().add(Region(0, 3))
+    view.sel().add(Region(8, 11))
+    inserted = insert_date.replace_selections_each(view, None, ["1", "22222"])
+
+    assert view.edits == 1
+    assert view.text == "1 bbb 22222"
+    assert inserted == [Region(0, 1), Region(6, 11)]
+
+
+def test_distant_selections_are_replaced_separately():
+    view = View("x" * (insert_date.MAX_BATCH_GAP + 10))
+    cursors(view, [0, view.size()])
+    insert_date.replace_selections_each(view, None, ["a", "b"])
+
+    assert view.edits == 2
+    assert view.text == "a" + "x" * (insert_date.MAX_BATCH_GAP + 10) + "b"
+
+
+def test_protected_regions_are_kept_outside_of_edits():
+    view = View("one\ntwo\nthree\n")
+    view.add_regions('bookmarks', [Region(8, 13)])
+    cursors(view, [0, 4, 14])
+    insert_date.replace_selections_each(view, None, ["1 ", "2 ", "3 "])
+
+    # The bookmark splits the selections, the first two are still replaced together
+    assert view.edits == 2
+    assert view.text == "1 one\n2 two\nthree\n3 "
+    assert view.get_regions('bookmarks') == [Region(12, 17)]
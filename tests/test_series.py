@@ -0,0 +1,47 @@
+import time
+from datetime import timedelta
+
+import pytest
+
+from format_date import FormatDate, LocalTimezone
+
+
+@pytest.fixture
+def new_york(monkeypatch):
+    if not hasattr(time, 'tzset'):
+        pytest.skip("Requires time.tzset")
+    monkeypatch.setenv('TZ', "America/New_York")
+    time.tzset()
+    # The offsets of `LocalTimezone` are read when the module is imported
+    std, dst = timedelta(seconds=-time.timezone), timedelta(seconds=-time.altzone)
+    local = type('NewYork', (LocalTimezone,),
+                 dict(STDOFFSET=std, DSTOFFSET=dst, DSTDIFF=dst - std, _tables={}))
+    yield FormatDate(local_tz=local())
+    monkeypatch.undo()
+    time.tzset()
+
+
+FORMAT = "%Y-%m-%d %H:%M %z"
+
+
+@pytest.mark.parametrize('backend', ['pytz', 'zoneinfo'])
+def test_dst_gap_moves_forward(backend):
+    fdate = FormatDate(backend=backend)
+    dates = fdate.series(3, "+1d", "2024-03-09 02:30", FORMAT, tz_out="America/New_York")
+    assert dates == ["2024-03-09 02:30 -0500", "2024-03-10 03:30 -0400",
+                     "2024-03-11 02:30 -0400"]
+
+
+def test_dst_gap_moves_forward_in_local_timezone(new_york):
+    fdate = new_york
+    local = fdate.series(3, "+1d", "2024-03-09 02:30", FORMAT, tz_in="local")
+    named = fdate.series(3, "+1d", "2024-03-09 02:30", FORMAT, tz_out="America/New_York")
+    assert local == named == ["2024-03-09 02:30 -0500", "2024-03-10 03:30 -0400",
+                              "2024-03-11 02:30 -0400"]
+
+
+def test_ambiguous_time_prefers_standard_time_in_local_timezone(new_york):
+    fdate = new_york
+    local = fdate.series(2, "+1d", "2024-11-02 01:30", FORMAT, tz_in="local")
+    named = fdate.series(2, "+1d", "2024-11-02 01:30", FORMAT, tz_out="America/New_York")
+    assert local == named == ["2024-11-02 01:30 -0400", "2024-11-03 01:30 -0500"]
@@ -0,0 +1,42 @@
+import sublime
+
+import pytest
+
+from InsertDate import insert_date
+
+
+class SettingsObject(dict):
+    def add_on_change(self, tag, callback):
+        pass
+
+    def clear_on_change(self, tag):
+        pass
+
+
+@pytest.fixture
+def load(monkeypatch):
+    messages = []
+    monkeypatch.setattr(sublime, 'status_message', messages.append, raising=False)
+
+    def load(**values):
+        values.setdefault('tz_in', "UTC")
+        monkeypatch.setattr(sublime, 'load_settings', lambda name: SettingsObject(values),
+                            raising=False)
+        insert_date.plugin_loaded()
+        return messages
+
+    yield load
+    insert_date.plugin_unloaded()
+
+
+@pytest.mark.parametrize('value, workers', [(4, 4), ("3", 3), (0, 1), (-2, 1)])
+def test_panel_workers(load, value, workers):
+    assert not load(panel_workers=value)
+    assert insert_date.s.derived('panel_workers') == workers
+
+
+@pytest.mark.parametrize('value', [None, "many", [2]])
+def test_invalid_panel_workers(load, value):
+    messages = load(panel_workers=value)
+    assert insert_date.s.derived('panel_workers') == 1
+    assert messages == ["[InsertDate] `panel_workers` setting is invalid; using 1"]
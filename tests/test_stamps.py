@@ -0,0 +1,77 @@
+import pytest
+
+from conftest import Region, View
+from InsertDate import insert_date
+
+
+STAMP_CONFIG = [
+    {"prefix": "Modified: ", "format": "%Y"},
+    {"prefix": "Last-Modified: ", "format": "iso", "tz_in": "UTC"},
+]
+
+
+class Settings(object):
+    modified_stamps_scan_size = 4096
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def derived(self, name):
+        assert name == 'stamp_entries'
+        return self.entries
+
+
+@pytest.fixture
+def entries(monkeypatch):
+    entries, errors = insert_date.expand_stamp_config(STAMP_CONFIG, "%c")
+    assert not errors
+    monkeypatch.setattr(insert_date, 's', Settings(entries))
+    return entries
+
+
+def refresh(view):
+    insert_date.InsertDateRefreshStampsCommand(view).run(None)
+
+
+def test_nested_prefixes_are_scanned_once(entries):
+    view = View("Last-Modified: 2020-01-01T00:00:00+00:00\nModified: 2020\nbody\n")
+    insert_date.scan_stamps(view, entries)
+
+    assert view.get_regions("insert_date.stamp:Last-Modified: ") == [Region(15, 40)]
+    assert view.get_regions("insert_date.stamp:Modified: ") == [Region(51, 55)]
+
+
+def test_nested_prefixes_are_refreshed_once(entries):
+    view = View("Last-Modified: 2020-01-01T00:00:00+00:00\nModified: 2020\nbody\n")
+    insert_date.scan_stamps(view, entries)
+    refresh(view)
+
+    lines = view.text.split('\n')
+    assert lines[0].startswith("Last-Modified: ")
+    assert lines[0] != "Last-Modified: 2020-01-01T00:00:00+00:00"
+    assert lines[1] != "Modified: 2020"
+    assert lines[1].startswith("Modified: ")
+    assert lines[2:] == ["body", ""]
+
+
+def test_overlapping_stamps_are_replaced_once(entries):
+    view = View("Last-Modified: 2020-01-01T00:00:00+00:00\nbody\n")
+    stamp = Region(15, 40)
+    # Tracked under both keys, e.g. by an older version of the plugin
+    view.add_regions("insert_date.stamp:Last-Modified: ", [stamp])
+    view.add_regions("insert_date.stamp:Modified: ", [stamp])
+    refresh(view)
+
+    first, rest = view.text.split('\n', 1)
+    assert first.startswith("Last-Modified: 2")
+    assert len(first) == len("Last-Modified: 2020-01-01T00:00:00+00:00")
+    assert rest == "body\n"
+
+
+def test_inserted_stamp_uses_longest_prefix(entries):
+    view = View("Last-Modified: \n")
+    view.sel().add(Region(15))
+    insert_date.insert_text(view, None, "x")
+
+    assert view.get_regions("insert_date.stamp:Last-Modified: ") == [Region(15, 16)]
+    assert view.get_regions("insert_date.stamp:Modified: ") == []